@@ -1,23 +1,23 @@
-import serpapi
-from api_key import API_KEY
+import engines
+import poster_fetch
 
-def GenreMixing(genre1, genre2):
-    query = genre1 + ' ' + genre2 + "Movies"
-    params = {
-            "q": query,
-            "engine": "google",
-            "hl": 'en',
-            "ijn": "0",
-            "api_key": API_KEY
-            }
-    search = serpapi.search(params)
-    if 'knowledge_graph' in search:
-        result = search['knowledge_graph']
-        posters = list(result.values())[0]
-        posters_list = [i['image'] for i in posters]
-        return posters_list
-    else:
-        return "Not Available"
+# Genre mixing over the local movie and TV catalogs: titles carrying every
+# requested genre (any number of them), minus excluded genres, ranked by
+# weighted rating or popularity. No web search is involved; SerpAPI is only
+# used when posters are asked for (through the shared poster cache).
+
+def genre_mix(genres, exclude=(), kind='movies', rank='rating', limit=20):
+    catalog = engines.ENGINES[kind]
+    rows = catalog.genre_mixer.rows(genres, exclude, rank, limit)
+    return [catalog.title_index.titles[r] for r in rows]
+
+def GenreMixing(genre1, genre2, kind='movies', posters=False):
+    titles = genre_mix([genre1, genre2], kind=kind)
+    if not posters:
+        return titles
+    from api_key import API_KEY
+    fetch = poster_fetch.movie_posters if kind == 'movies' else poster_fetch.show_images
+    return fetch(titles, API_KEY)
     
 if __name__ == "__main__":
     genre1 = input("Enter Genre 1: ")
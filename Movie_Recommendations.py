@@ -2,216 +2,35 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from sklearn.feature_extraction.text import TfidfVectorizer,CountVectorizer
-from sklearn.metrics.pairwise import linear_kernel,cosine_similarity
+from sklearn.preprocessing import normalize
 from ast import literal_eval
+from neighbors import TOP_K, topk_neighbors, query_topk, extend_neighbors, profile_scores, page_topk
+from genres import bitmasks, group_mask, popcount, GenreMixer
+from title_index import TitleIndex
+from charts import VOTE_QUANTILE, weighted_rating, genre_key, top_charts
+import artifacts
+import catalog
+import columnar
+import compact
+import metrics
+import json
 import warnings
 import os
+from functools import lru_cache
 warnings.filterwarnings('ignore')
 
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATASETS_DIR = os.path.join(SCRIPT_DIR, 'datasets')
+SOURCES = [os.path.join(DATASETS_DIR, 'tmdb_5000_credits.csv'),
+           os.path.join(DATASETS_DIR, 'tmdb_5000_movies.csv')]
+# Columns the build reads from the columnar dataset
+COLUMNS = ['title', 'overview', 'genres', 'keywords', 'cast', 'director', 'vote_count', 'vote_average', 'popularity']
 
-# Read CSV files with proper path handling
-df1 = pd.read_csv(os.path.join(DATASETS_DIR, 'tmdb_5000_credits.csv'))
-df2 = pd.read_csv(os.path.join(DATASETS_DIR, 'tmdb_5000_movies.csv'))
+# Genre groups used by the recommendation filter (names as cleaned by clean_data)
+ACTION_SCI_FI_GENRES = {'action', 'adventure', 'sciencefiction', 'sci-fi', 'science fiction', 'thriller', 'crime'}
+EXCLUDED_GENRES = {'family', 'children', 'animation', 'horror', 'fantasy'}
 
-df1.columns = ['id','title_x','cast','crew']
-df2 = df2.merge(df1,on = 'id')
-df2.head(5)
-
-m = df2['vote_count'].quantile(0.9)
-C = df2['vote_average'].mean()
-
-def weight_average(x):
-    v = x['vote_count']
-    R = x['vote_average']
-    return (v/(v+m))*R + (m/(v+m))*C
-
-q_movies = df2.copy().loc[df2['vote_count'] >= m]
-q_movies['score'] = q_movies.apply(weight_average , axis = 1)
-q_movies = q_movies.sort_values('score' , ascending = False)
-
-tfidf = TfidfVectorizer( stop_words='english' )
-df2['overview'] = df2['overview'].fillna('')
-tfidf_matrix = tfidf.fit_transform(df2['overview'])
-
-cosine_sim = linear_kernel(tfidf_matrix, tfidf_matrix)
-
-indices = pd.Series(df2.index, index=df2['title']).drop_duplicates()
-
-def get_recommendations(title,cosine_sim = cosine_sim):
-    # Case-insensitive search with fuzzy matching
-    title_lower = title.lower().strip()
-    
-    # Try exact match first
-    if title in indices:
-        idx = indices[title]
-    else:
-        # Try case-insensitive match
-        matching_titles = df2[df2['title'].str.lower() == title_lower]
-        if len(matching_titles) > 0:
-            idx = matching_titles.index[0]
-        else:
-            # Try partial/fuzzy match
-            matching_titles = df2[df2['title'].str.lower().str.contains(title_lower, na=False)]
-            if len(matching_titles) > 0:
-                idx = matching_titles.index[0]
-            else:
-                raise ValueError(f"Movie '{title}' not found in database. Please check the spelling or try a different movie.")
-    
-    # Get the source movie's genres for filtering
-    source_movie = df2.iloc[idx]
-    source_genres = set()
-    if isinstance(source_movie.get('genres'), list):
-        source_genres = set([g.lower() if isinstance(g, str) else str(g).lower() for g in source_movie.get('genres', [])])
-    elif isinstance(source_movie.get('genres'), str):
-        try:
-            from ast import literal_eval
-            genres_list = literal_eval(source_movie.get('genres', '[]'))
-            source_genres = set([g.get('name', '').lower() if isinstance(g, dict) else str(g).lower() for g in genres_list])
-        except:
-            pass
-    
-    sim_scores = list(enumerate(cosine_sim[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-    
-    # Get more candidates and filter by genre similarity
-    candidates = sim_scores[1:31]  # Get top 30 candidates for better filtering
-    filtered_movies = []
-    
-    for score_idx, score in candidates:
-        movie = df2.iloc[score_idx]
-        movie_genres = set()
-        
-        # Extract genres
-        if isinstance(movie.get('genres'), list):
-            movie_genres = set([g.lower() if isinstance(g, str) else str(g).lower() for g in movie.get('genres', [])])
-        elif isinstance(movie.get('genres'), str):
-            try:
-                from ast import literal_eval
-                genres_list = literal_eval(movie.get('genres', '[]'))
-                movie_genres = set([g.get('name', '').lower() if isinstance(g, dict) else str(g).lower() for g in genres_list])
-            except:
-                pass
-        
-        # Calculate genre overlap score
-        if source_genres and movie_genres:
-            genre_overlap_count = len(source_genres & movie_genres)
-            genre_overlap_ratio = genre_overlap_count / max(len(source_genres), len(movie_genres))
-            
-            # Define action/sci-fi genres that should match well
-            action_sci_fi_genres = {'action', 'adventure', 'sciencefiction', 'sci-fi', 'science fiction', 'thriller', 'crime'}
-            source_is_action_sci_fi = len(source_genres & action_sci_fi_genres) > 0
-            movie_is_action_sci_fi = len(movie_genres & action_sci_fi_genres) > 0
-            
-            # Exclude children/family/horror/fantasy for action movies
-            exclude_genres = {'family', 'children', 'animation', 'horror', 'fantasy'}
-            movie_has_excluded = len(movie_genres & exclude_genres) > 0
-            
-            # STRICT: Exclude family/children/horror/fantasy movies for action/sci-fi films
-            # unless they have very high similarity (>0.4) AND multiple genre matches
-            if source_is_action_sci_fi and movie_has_excluded and not movie_is_action_sci_fi:
-                # Only allow if it's a sequel (high title similarity) with very high score
-                if title_similarity < 0.3 or score < 0.4:
-                    has_good_overlap = False  # Exclude children/family/horror movies for action films
-                else:
-                    has_good_overlap = genre_overlap_count >= 2 and score > 0.4
-            elif source_is_action_sci_fi and movie_is_action_sci_fi:
-                # For action movies, require at least 1 genre match
-                # If 2+ genres match, require score > 0.08
-                # If only 1 genre match, require score > 0.09 (excludes Cave Bear at 0.081)
-                if genre_overlap_count >= 2:
-                    has_good_overlap = score > 0.08  # Lower threshold for 2+ genres
-                else:
-                    has_good_overlap = score > 0.09  # Higher threshold for single genre (excludes 0.081)
-            else:
-                # For non-action movies, require 2+ genres OR high overlap ratio
-                has_good_overlap = (genre_overlap_count >= 2 or genre_overlap_ratio > 0.6) and score > 0.25
-        else:
-            # If genre info is missing, rely on similarity score (must be high)
-            has_good_overlap = score > 0.3 if source_genres or movie_genres else True
-        
-        # Also check if it's a sequel/same franchise (contains similar words)
-        source_title_words = set(title.lower().split())
-        movie_title = str(movie.get('title', '')).lower()
-        movie_title_words = set(movie_title.split())
-        title_similarity = len(source_title_words & movie_title_words) / max(len(source_title_words), 1)
-        
-        # Prioritize movies with title similarity or good genre overlap
-        # For sequels (high title similarity), be more lenient
-        # ONLY add if has_good_overlap is True (not False)
-        if has_good_overlap:
-            if title_similarity > 0.3:
-                filtered_movies.append((score_idx, score, genre_overlap_count if source_genres and movie_genres else 0, title_similarity))
-            else:
-                filtered_movies.append((score_idx, score, genre_overlap_count if source_genres and movie_genres else 0, title_similarity))
-        
-        # Stop when we have 10 good recommendations
-        if len(filtered_movies) >= 10:
-            break
-    
-    # Sort by genre overlap and similarity, then take top 10
-    filtered_movies.sort(key=lambda x: (x[2], x[3], x[1]), reverse=True)
-    
-    # If we don't have 10 after filtering, add more from similarity scores
-    # BUT only add movies that pass basic filters (no excluded genres)
-    if len(filtered_movies) < 10:
-        remaining = []
-        for x in candidates:
-            if x[0] not in [m[0] for m in filtered_movies]:
-                movie = df2.iloc[x[0]]
-                movie_genres = set()
-                if isinstance(movie.get('genres'), str):
-                    try:
-                        from ast import literal_eval
-                        genres_list = literal_eval(movie.get('genres', '[]'))
-                        movie_genres = set([g.get('name', '').lower() if isinstance(g, dict) else str(g).lower() for g in genres_list])
-                    except:
-                        pass
-                elif isinstance(movie.get('genres'), list):
-                    movie_genres = set([g.lower() if isinstance(g, str) else str(g).lower() for g in movie.get('genres', [])])
-                
-                exclude_genres = {'family', 'children', 'animation', 'horror', 'fantasy'}
-                movie_has_excluded = len(movie_genres & exclude_genres) > 0
-                
-                # Skip excluded genres for action/sci-fi sources
-                if source_genres and movie_genres:
-                    action_sci_fi_genres = {'action', 'adventure', 'sciencefiction', 'sci-fi', 'science fiction', 'thriller', 'crime'}
-                    source_is_action_sci_fi = len(source_genres & action_sci_fi_genres) > 0
-                    movie_is_action_sci_fi = len(movie_genres & action_sci_fi_genres) > 0
-                    
-                    # Skip excluded genres
-                    if source_is_action_sci_fi and movie_has_excluded and not movie_is_action_sci_fi:
-                        continue  # Skip this movie
-                    
-                    # Also check similarity score - must be > 0.09 for single genre matches
-                    genre_overlap_count = len(source_genres & movie_genres)
-                    if source_is_action_sci_fi and movie_is_action_sci_fi:
-                        if genre_overlap_count >= 2:
-                            if x[1] <= 0.08:  # score too low for 2+ genres
-                                continue
-                        else:
-                            if x[1] <= 0.09:  # score too low for single genre (excludes Cave Bear at 0.081)
-                                continue
-                    elif source_is_action_sci_fi:
-                        # Source is action but movie is not - skip if score too low
-                        if x[1] <= 0.08:
-                            continue
-                
-                remaining.append((x[0], x[1], 0, 0))
-                if len(remaining) >= (10 - len(filtered_movies)):
-                    break
-        
-        filtered_movies.extend(remaining)
-    
-    movie_indices = [i[0] for i in filtered_movies[:10]]
-    return df2['title'].iloc[movie_indices]
-
-features = ['cast', 'crew', 'keywords', 'genres']
-for feature in features:
-    df2[feature] = df2[feature].apply(literal_eval)
-    
 def get_director(x):
     for i in x:
         if (i['job'] == 'Director'):
@@ -226,11 +45,6 @@ def get_list(x):
         return names
     return []
 
-df2['director'] = df2['crew'].apply(get_director)
-features = ['cast', 'keywords', 'genres']
-for feature in features:
-    df2[feature] = df2[feature].apply(get_list)
-    
 def clean_data(x):
     if isinstance(x, list):
         return [str.lower(i.replace(" ", "")) for i in x]
@@ -239,20 +53,381 @@ def clean_data(x):
             return str.lower(x.replace(" ", ""))
         else:
             return ''
-        
-features = ['cast', 'keywords', 'director', 'genres']
-for feature in features:
-    df2[feature] = df2[feature].apply(clean_data)
-    
+
 def create_soup(x):
     return ' '.join(x['keywords']) + ' ' + ' '.join(x['cast']) + ' ' + x['director'] + ' ' + ' '.join(x['genres'])
-df2['soup'] = df2.apply(create_soup, axis=1)
 
-count = CountVectorizer(stop_words='english')
-count_matrix = count.fit_transform(df2['soup'])
-cosine_sim2 = cosine_similarity(count_matrix, count_matrix)
-df2 = df2.reset_index()
+def add_features(df2, parsed=False):
+    # Parse the JSON credit/keyword/genre columns and build the credits soup.
+    # parsed=True: cast/keywords/genres are already lists of names and the
+    # director column exists (columnar datasets, see columnar.py)
+    if parsed:
+        for feature in ['cast', 'keywords', 'genres']:
+            df2[feature] = df2[feature].apply(lambda names: list(names[:3]))
+    else:
+        features = ['cast', 'crew', 'keywords', 'genres']
+        for feature in features:
+            df2[feature] = df2[feature].apply(literal_eval)
+
+        df2['director'] = df2['crew'].apply(get_director)
+        features = ['cast', 'keywords', 'genres']
+        for feature in features:
+            df2[feature] = df2[feature].apply(get_list)
+
+    features = ['cast', 'keywords', 'director', 'genres']
+    for feature in features:
+        df2[feature] = df2[feature].apply(clean_data)
+
+    df2['soup'] = df2.apply(create_soup, axis=1)
+    return df2
+
+def build_model():
+    # Full pipeline from the datasets: parse, vectorize and build both neighbour
+    # tables. The columnar copy (python columnar.py) skips the CSV and JSON parsing.
+    df2 = columnar.read(columnar.MOVIES_PATH, SOURCES, COLUMNS)
+    parsed = df2 is not None
+    if not parsed:
+        df1 = pd.read_csv(SOURCES[0])
+        df2 = pd.read_csv(SOURCES[1])
+
+        df1.columns = ['id','title_x','cast','crew']
+        df2 = df2.merge(df1,on = 'id')
+
+    tfidf = TfidfVectorizer( stop_words='english' )
+    df2['overview'] = df2['overview'].fillna('')
+    tfidf_matrix = tfidf.fit_transform(df2['overview'])
+
+    # Top-K neighbour table (ids + float32 scores) instead of the dense N x N kernel
+    neighbor_ids, neighbor_scores = topk_neighbors(tfidf_matrix, TOP_K)
+
+    df2 = add_features(df2, parsed)
+    count = CountVectorizer(stop_words='english')
+    credit_matrix = normalize(count.fit_transform(df2['soup'])).astype(np.float32)
+    credit_neighbor_ids, credit_neighbor_scores = topk_neighbors(credit_matrix, TOP_K)
+    df2 = df2.reset_index()
+    genre_names, genre_mask = bitmasks(df2['genres'])
+    # Only the serving columns outlive the build (see compact.py)
+    df2 = compact.catalog_frame('title', df2['title'], df2)
+    return {
+        'df2': df2,
+        'title_index': TitleIndex(df2['title'], df2['popularity']),
+        'genre_names': genre_names,
+        'genre_mask': genre_mask,
+        'tfidf': tfidf,
+        'tfidf_matrix': tfidf_matrix.astype(np.float32),
+        'count': count,
+        'credit_matrix': credit_matrix,
+        'neighbor_ids': neighbor_ids,
+        'neighbor_scores': neighbor_scores,
+        'credit_neighbor_ids': credit_neighbor_ids,
+        'credit_neighbor_scores': credit_neighbor_scores,
+        'version': artifacts.dataset_version(artifacts.source_stamp(SOURCES)),
+    }
+
+def save_model(model):
+    df2 = model['df2']
+    arrays = {key: model[key] for key in ['neighbor_ids', 'neighbor_scores', 'credit_neighbor_ids', 'credit_neighbor_scores', 'genre_mask']}
+    for column in ['vote_count', 'vote_average', 'popularity']:
+        arrays[column] = df2[column].to_numpy(np.float32)
+    records = {'title': df2['title'].tolist(), 'genre_names': model['genre_names']}
+    title_arrays, title_records = model['title_index'].artifact_parts()
+    arrays.update(title_arrays)
+    arrays.update(artifacts.sparse_arrays('tfidf', model['tfidf_matrix']))
+    arrays.update(artifacts.sparse_arrays('credits', model['credit_matrix']))
+    records.update(title_records)
+    return artifacts.save('movies', SOURCES, arrays=arrays, records=records,
+                          models={'tfidf': model['tfidf'], 'count': model['count']},
+                          info={'rows': len(df2), 'top_k': model['neighbor_ids'].shape[1]})
+
+def load_model():
+    # Memory-mapped build from build.py, or None if missing/stale
+    stored = artifacts.load('movies', SOURCES)
+    if stored is None:
+        return None
+    arrays, records = stored['arrays'], stored['records']
+    df2 = compact.catalog_frame('title', records['title'], arrays)
+    model = {
+        'df2': df2,
+        'genre_names': records['genre_names'],
+        'title_index': TitleIndex.from_artifacts(records['title'], arrays['popularity'], arrays, records),
+        'version': stored['manifest']['version'],
+    }
+    model.update(stored['models'])
+    model['tfidf_matrix'] = artifacts.load_sparse(arrays, 'tfidf', len(model['tfidf'].vocabulary_))
+    model['credit_matrix'] = artifacts.load_sparse(arrays, 'credits', len(model['count'].vocabulary_))
+    model.update({key: arrays[key] for key in ['neighbor_ids', 'neighbor_scores', 'credit_neighbor_ids', 'credit_neighbor_scores', 'genre_mask']})
+    return model
+
+model = load_model()
+MODEL_SOURCE = 'artifacts' if model is not None else 'csv'
+if model is None:
+    model = build_model()
+MODEL_VERSION = model['version']
+
+df2 = model['df2']
+tfidf = model['tfidf']
+tfidf_matrix = model['tfidf_matrix']
+count = model['count']
+credit_matrix = model['credit_matrix']
+neighbor_ids, neighbor_scores = model['neighbor_ids'], model['neighbor_scores']
+credit_neighbor_ids, credit_neighbor_scores = model['credit_neighbor_ids'], model['credit_neighbor_scores']
+titles = df2['title'].to_numpy()
+title_index = model['title_index']
+genre_names, genre_mask = model['genre_names'], np.asarray(model['genre_mask'])
+ACTION_SCI_FI_MASK = group_mask(genre_names, ACTION_SCI_FI_GENRES)
+EXCLUDED_MASK = group_mask(genre_names, EXCLUDED_GENRES)
+
+m = df2['vote_count'].quantile(VOTE_QUANTILE)
+C = df2['vote_average'].mean()
+
+def weight_average(x):
+    return weighted_rating(x['vote_count'], x['vote_average'], m, C)
+
+# Weighted rating of every row in one vectorized pass
+ratings = weighted_rating(df2['vote_count'].to_numpy(np.float64), df2['vote_average'].to_numpy(np.float64), m, C)
+qualified = df2['vote_count'].to_numpy() >= m
+# scaled to 0..1 for blending with cosine scores in hybrid mode
+rating_scores = (ratings / 10.0).clip(0, 1)
+
+q_movies = df2.loc[qualified].assign(score=ratings[qualified]).sort_values('score', ascending=False)
+
+# Precomputed top lists, overall and per genre, for /api/charts
+charts, chart_genres = top_charts(ratings, qualified, compact.genre_lists(genre_names, genre_mask))
+
+# Genre mixing (titles carrying several genres at once) over the same bitmasks
+genre_mixer = GenreMixer(genre_names, genre_mask, {'rating': ratings, 'popularity': df2['popularity']})
+
 indices = pd.Series(df2.index, index=df2['title'])
 
+# Results depend only on the resolved row and the model build, so they are
+# memoized on (row, version): "the conjuring" and "The Conjuring" share an entry
+RESULT_CACHE_SIZE = int(os.environ.get('ULTRON_RESULT_CACHE', 4096))
+WARM_TOP_N = int(os.environ.get('ULTRON_WARM_TOP_N', 0))
+
+# Ranking modes: overview text (TF-IDF), credits (keywords, cast, director,
+# genres) or a blend of both neighbour lists with the weighted rating.
+MODES = ('overview', 'credits', 'hybrid')
+HYBRID_CANDIDATES = int(os.environ.get('ULTRON_HYBRID_CANDIDATES', 30))
+HYBRID_WEIGHTS = tuple(float(w) for w in os.environ.get('ULTRON_HYBRID_WEIGHTS', '0.45,0.35,0.2').split(','))
+
+def _table_scores(ids, scores, candidates):
+    # Score of each candidate in one row of a neighbour table, 0 if not listed
+    order = np.argsort(ids, kind='stable')
+    pos = np.minimum(np.searchsorted(ids[order], candidates), len(ids) - 1)
+    return np.where(ids[order][pos] == candidates, scores[order][pos], 0.0)
+
+def hybrid_rows(idx, k=10):
+    # Union of the best overview and credits candidates, ranked by
+    # w_overview * overview cosine + w_credits * credits cosine + w_rating * rating
+    overview_ids, credit_ids = np.asarray(neighbor_ids[idx]), np.asarray(credit_neighbor_ids[idx])
+    n = max(HYBRID_CANDIDATES, k)
+    candidates = np.union1d(overview_ids[:n], credit_ids[:n])
+    w_overview, w_credits, w_rating = HYBRID_WEIGHTS
+    blended = (w_overview * _table_scores(overview_ids, np.asarray(neighbor_scores[idx]), candidates)
+               + w_credits * _table_scores(credit_ids, np.asarray(credit_neighbor_scores[idx]), candidates)
+               + w_rating * rating_scores[candidates])
+    order = np.lexsort((candidates, -blended))[:k]
+    return candidates[order], blended[order].astype(np.float32)
+
+@lru_cache(maxsize=RESULT_CACHE_SIZE)
+def recommend_index(idx, version, mode):
+    # Row ids of the (up to) 10 recommendations for catalog row idx; only
+    # result cache misses get here, so the spans time uncached work
+    if mode == 'credits':
+        return tuple(np.asarray(credit_neighbor_ids[idx, :10]).tolist())
+    if mode == 'hybrid':
+        with metrics.span('movies.hybrid_blend'):
+            return tuple(hybrid_rows(idx, 10)[0].tolist())
+    with metrics.span('movies.genre_filter'):
+        return genre_filtered(idx)
+
+def genre_filtered(idx):
+    # Overview neighbours of row idx, filtered and reordered by genre overlap
+    # Genre filter over the whole candidate block using the precomputed bitmasks
+    candidates = np.asarray(neighbor_ids[idx, :30])  # Get top 30 candidates for better filtering
+    scores = np.asarray(neighbor_scores[idx, :30], dtype=np.float64)
+    source = genre_mask[idx]
+    masks = genre_mask[candidates]
+
+    overlap = popcount(masks & source)
+    overlap_ratio = overlap / np.maximum(np.maximum(popcount(source), popcount(masks)), 1)
+    has_genres = (source != 0) & (masks != 0)
+    source_is_action_sci_fi = bool(source & ACTION_SCI_FI_MASK)
+    movie_is_action_sci_fi = (masks & ACTION_SCI_FI_MASK) != 0
+    movie_has_excluded = (masks & EXCLUDED_MASK) != 0
+    blocked = source_is_action_sci_fi & movie_has_excluded & ~movie_is_action_sci_fi
+
+    # Also check if it's a sequel/same franchise (contains similar words)
+    source_title_words = set(str(titles[idx]).lower().split())
+    title_similarity = np.array([len(source_title_words & set(str(t).lower().split()))
+                                 for t in titles[candidates]]) / max(len(source_title_words), 1)
+
+    # For action movies, 2+ shared genres need score > 0.08 and a single one > 0.09
+    # (excludes Cave Bear at 0.081); family/children/horror/fantasy picks are only
+    # kept for sequels with very high similarity and multiple genre matches
+    action_threshold = np.where(overlap >= 2, 0.08, 0.09)
+    if source_is_action_sci_fi:
+        has_good_overlap = np.where(blocked, (title_similarity >= 0.3) & (scores > 0.4) & (overlap >= 2),
+                           np.where(movie_is_action_sci_fi, scores > action_threshold,
+                                    ((overlap >= 2) | (overlap_ratio > 0.6)) & (scores > 0.25)))
+    else:
+        # For non-action movies, require 2+ genres OR high overlap ratio
+        has_good_overlap = ((overlap >= 2) | (overlap_ratio > 0.6)) & (scores > 0.25)
+    # If genre info is missing, rely on similarity score (must be high)
+    has_good_overlap = np.where(has_genres, has_good_overlap, (scores > 0.3) | ((source == 0) & (masks == 0)))
+
+    # First 10 good candidates, sorted by genre overlap, title similarity, then score
+    filtered = np.flatnonzero(has_good_overlap)[:10]
+    overlap = np.where(has_genres, overlap, 0)
+    filtered = filtered[np.lexsort((-scores[filtered], -title_similarity[filtered], -overlap[filtered]))]
+
+    # If we don't have 10 after filtering, add more from similarity scores
+    # BUT only add movies that pass basic filters (no excluded genres)
+    if len(filtered) < 10:
+        skip = has_genres & source_is_action_sci_fi & (
+            blocked
+            | (movie_is_action_sci_fi & (scores <= action_threshold))
+            | (~movie_is_action_sci_fi & (scores <= 0.08)))
+        remaining = np.flatnonzero(~has_good_overlap & ~skip)[:10 - len(filtered)]
+        filtered = np.concatenate([filtered, remaining])
+
+    return tuple(candidates[filtered].tolist())
+
+def resolve(title):
+    # Catalog row of a title: exact, case-insensitive, partial and then fuzzy match
+    with metrics.span('movies.resolve'):
+        idx = title_index.resolve(title)
+    if idx is None:
+        raise ValueError(f"Movie '{title}' not found in database. Please check the spelling or try a different movie.")
+    return idx
+
+def recommendations_for(idx, mode='overview'):
+    # Titles recommended for catalog row idx
+    with metrics.span('movies.rank'):
+        movie_indices = list(recommend_index(idx, MODEL_VERSION, mode))
+    return df2['title'].iloc[movie_indices]
+
+def get_recommendations(title, mode='overview'):
+    if mode not in MODES:
+        raise ValueError(f"Unknown model '{mode}'. Choose one of: {', '.join(MODES)}.")
+    return recommendations_for(resolve(title), mode)
+
+def similar_rows(rows, k=10, mode='overview'):
+    # Raw neighbours (no genre filter) of many rows at once. Overview: a gather
+    # from the neighbour table when k fits in it, else one batched sparse product.
+    # Credits lists are capped at the table width; hybrid is blended per row.
+    rows = np.asarray(rows, dtype=np.int64)
+    if mode == 'credits':
+        return np.asarray(credit_neighbor_ids[rows, :k]), np.asarray(credit_neighbor_scores[rows, :k])
+    if mode == 'hybrid':
+        blended = [hybrid_rows(idx, k) for idx in rows]
+        return [b[0] for b in blended], [b[1] for b in blended]
+    if k <= neighbor_ids.shape[1]:
+        return np.asarray(neighbor_ids[rows, :k]), np.asarray(neighbor_scores[rows, :k])
+    return query_topk(tfidf_matrix, rows, k)
+
+def max_k(mode='overview'):
+    # Largest k similar_rows can fill for a mode (None: any k). Credits and
+    # hybrid lists come from the precomputed neighbour tables.
+    if mode == 'overview':
+        return None
+    return min(neighbor_ids.shape[1], credit_neighbor_ids.shape[1])
+
+def profile_rows(rows, weights, offset=0, limit=10, mode='overview'):
+    # One page of recommendations for a taste profile (several weighted seed
+    # rows, negative weights for dislikes), seeds excluded. Every mode scores
+    # the whole catalog against the profile centroid; hybrid blends both
+    # spaces with the weighted rating like hybrid_rows.
+    with metrics.span('movies.profile'):
+        if mode == 'credits':
+            scores = profile_scores(credit_matrix, rows, weights)
+        elif mode == 'hybrid':
+            w_overview, w_credits, w_rating = HYBRID_WEIGHTS
+            scores = (w_overview * profile_scores(tfidf_matrix, rows, weights)
+                      + w_credits * profile_scores(credit_matrix, rows, weights)
+                      + w_rating * rating_scores)
+        else:
+            scores = profile_scores(tfidf_matrix, rows, weights)
+        return page_topk(scores, offset, limit, exclude=rows)
+
+def top_rated(genre=None, n=10):
+    # Best rated row ids overall or for one genre; None for an unknown genre
+    chart = charts.get(genre_key(genre) if genre else '')
+    return None if chart is None else chart[:n]
+
+def json_names(values):
+    # ["Action", ...] -> the TMDB JSON column format read back by add_features
+    return json.dumps([{'id': i, 'name': str(value)} for i, value in enumerate(values)])
+
+def ingest(items):
+    # Append movies without a refit: vectorize with the fitted TF-IDF and
+    # CountVectorizer vocabularies, update only the neighbour rows the new
+    # titles enter, append to the CSVs and save the artifacts. Use through
+    # catalog.ingest, which also reloads this module. Returns the new row ids.
+    # items: [{"title", "overview", "genres": [...], "keywords": [...],
+    #          "cast": [...], "director", "vote_count", "vote_average", "popularity"}]
+    first_id = catalog.next_id(SOURCES[1], 'id', len(df2))
+    movies, credits = [], []
+    for i, item in enumerate(items):
+        movies.append({'id': first_id + i, 'title': item['title'], 'original_title': item['title'],
+                       'overview': item.get('overview', ''), 'genres': json_names(item.get('genres') or []),
+                       'keywords': json_names(item.get('keywords') or []),
+                       'vote_count': float(item.get('vote_count') or 0), 'vote_average': float(item.get('vote_average') or 0),
+                       'popularity': float(item.get('popularity') or 0)})
+        crew = [{'job': 'Director', 'name': item['director']}] if item.get('director') else []
+        credits.append({'movie_id': first_id + i, 'title': item['title'], 'crew': json.dumps(crew),
+                        'cast': json_names(item.get('cast') or [])})
+    new = pd.DataFrame(movies).merge(pd.DataFrame(credits).rename(columns={'movie_id': 'id', 'title': 'title_x'}), on='id')
+    new['overview'] = new['overview'].fillna('')
+    new = add_features(new)
+
+    n_old = len(df2)
+    new_tfidf = tfidf.transform(new['overview']).astype(np.float32)
+    new_credits = normalize(count.transform(new['soup'])).astype(np.float32)
+    all_tfidf, ids, scores = extend_neighbors(neighbor_ids, neighbor_scores, tfidf_matrix, new_tfidf)
+    all_credits, credit_ids, credit_scores = extend_neighbors(credit_neighbor_ids, credit_neighbor_scores, credit_matrix, new_credits)
+    frame = pd.concat([df2, compact.catalog_frame('title', new['title'], new)], ignore_index=True)
+    # Existing genre bits keep their positions; unseen genres are appended
+    names = list(genre_names) + sorted({g for genres in new['genres'] for g in genres} - set(genre_names))
+    masks = np.concatenate([genre_mask, bitmasks(new['genres'], names)[1]])
+
+    catalog.append_rows(SOURCES[1], movies)
+    catalog.append_rows(SOURCES[0], credits)
+    save_model({
+        'df2': frame,
+        'title_index': TitleIndex(frame['title'], frame['popularity']),
+        'genre_names': names,
+        'genre_mask': masks,
+        'tfidf': tfidf,
+        'tfidf_matrix': all_tfidf,
+        'count': count,
+        'credit_matrix': all_credits,
+        'neighbor_ids': ids,
+        'neighbor_scores': scores,
+        'credit_neighbor_ids': credit_ids,
+        'credit_neighbor_scores': credit_scores,
+    })
+    return list(range(n_old, len(frame)))
+
+def result_cache_info():
+    return recommend_index.cache_info()
+
+def catalog_memory():
+    # Bytes held by the serving catalog, per frame column and per model array
+    return compact.memory_report(df2, {
+        'neighbor_ids': neighbor_ids, 'neighbor_scores': neighbor_scores,
+        'credit_neighbor_ids': credit_neighbor_ids, 'credit_neighbor_scores': credit_neighbor_scores,
+        'tfidf_matrix': tfidf_matrix, 'credit_matrix': credit_matrix, 'genre_mask': genre_mask,
+        'ratings': ratings, 'title_postings': title_index.postings,
+    })
+
+def warm_cache(top_n=WARM_TOP_N):
+    # Precompute results for the top_n best rated titles of the q_movies chart
+    for idx in q_movies.index[:top_n]:
+        recommend_index(int(idx), MODEL_VERSION, 'overview')
+
+if WARM_TOP_N:
+    warm_cache()
+
 if __name__ == "__main__":
     print(get_recommendations('The Conjuring')).tolist()
\ No newline at end of file
@@ -2,46 +2,252 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 from sklearn.feature_extraction.text import TfidfVectorizer,CountVectorizer
-from sklearn.metrics.pairwise import cosine_similarity,cosine_similarity,linear_kernel
 from ast import literal_eval
 import warnings
 from scipy.sparse import csr_matrix
 import os
+from functools import lru_cache
+from neighbors import TOP_K, BLOCK_SIZE, N_JOBS, topk_neighbors, query_topk, extend_neighbors, profile_scores, page_topk
+from ann import IVFIndex, ann_neighbors, unit_rows
+import artifacts
+import catalog
+import columnar
+import compact
+from columnar import split_genres
+import metrics
+from title_index import TitleIndex
+from genres import bitmasks, GenreMixer
+from charts import VOTE_QUANTILE, weighted_rating, genre_key, top_charts
 warnings.filterwarnings('ignore')
 
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATASETS_DIR = os.path.join(SCRIPT_DIR, 'datasets')
+SOURCES = [os.path.join(DATASETS_DIR, 'TMDB_tv_dataset_v3.csv')]
+# exact: blockwise TF-IDF cosine over the whole catalog (O(N^2) build)
+# ann: LSA + IVF index, neighbour table built from approximate searches
+BACKEND = os.environ.get('ULTRON_SHOWS_BACKEND', 'exact')
+# Columns the build reads from the columnar dataset
+COLUMNS = ['name', 'overview', 'genres', 'vote_count', 'vote_average', 'popularity']
 
-# Read CSV file with proper path handling
-df2 = pd.read_csv(os.path.join(DATASETS_DIR, 'TMDB_tv_dataset_v3.csv'))
-m = df2['vote_count'].quantile(0.9)
+def build_model():
+    # Columnar copy when it is current (python columnar.py), else the CSV
+    df2 = columnar.read(columnar.SHOWS_PATH, SOURCES, COLUMNS)
+    if df2 is None:
+        df2 = pd.read_csv(SOURCES[0])
+        df2['genres'] = df2['genres'].map(split_genres)
+    tfidf = TfidfVectorizer( stop_words='english' )
+    df2['overview'] = df2['overview'].fillna('')
+    tfidf_matrix = tfidf.fit_transform(df2['overview'])
+    tfidf_matrix_sparse = csr_matrix(tfidf_matrix, dtype=np.float32)
+
+    svd, ann_index = None, None
+    if BACKEND == 'ann':
+        svd, ann_index, neighbor_ids, neighbor_scores = ann_neighbors(tfidf_matrix_sparse, TOP_K)
+    else:
+        # Whole catalog, streamed through the sparse product BLOCK_SIZE rows at a time
+        neighbor_ids, neighbor_scores = topk_neighbors(tfidf_matrix_sparse, TOP_K, BLOCK_SIZE, N_JOBS)
+    genre_names, genre_mask = bitmasks(df2['genres'])
+    # Only the serving columns outlive the build (see compact.py)
+    df2 = compact.catalog_frame('name', df2['name'], df2)
+    return {
+        'df2': df2,
+        'genre_names': genre_names,
+        'genre_mask': genre_mask,
+        'tfidf': tfidf,
+        'tfidf_matrix': tfidf_matrix_sparse,
+        'neighbor_ids': neighbor_ids,
+        'neighbor_scores': neighbor_scores,
+        'svd': svd,
+        'ann_index': ann_index,
+        'title_index': TitleIndex(df2['name'], df2['popularity']),
+        'version': artifacts.dataset_version(artifacts.source_stamp(SOURCES), BACKEND),
+    }
+
+def save_model(model):
+    df2 = model['df2']
+    arrays = {'neighbor_ids': model['neighbor_ids'], 'neighbor_scores': model['neighbor_scores'], 'genre_mask': model['genre_mask']}
+    for column in ['vote_count', 'vote_average', 'popularity']:
+        arrays[column] = df2[column].to_numpy(np.float32)
+    records = {'name': df2['name'].tolist(), 'genre_names': model['genre_names']}
+    title_arrays, title_records = model['title_index'].artifact_parts()
+    arrays.update(title_arrays)
+    arrays.update(artifacts.sparse_arrays('tfidf', model['tfidf_matrix']))
+    records.update(title_records)
+    models = {'tfidf': model['tfidf']}
+    if model['ann_index'] is not None:
+        arrays.update(model['ann_index'].to_arrays())
+        models['svd'] = model['svd']
+    return artifacts.save('shows', SOURCES, arrays=arrays, records=records, models=models,
+                          info={'rows': len(df2), 'top_k': model['neighbor_ids'].shape[1], 'backend': BACKEND},
+                          variant=BACKEND)
+
+def load_model():
+    # Memory-mapped build from build.py, or None if missing/stale
+    stored = artifacts.load('shows', SOURCES)
+    if stored is None or stored['manifest']['info'].get('backend', 'exact') != BACKEND:
+        return None
+    arrays, records = stored['arrays'], stored['records']
+    df2 = compact.catalog_frame('name', records['name'], arrays)
+    tfidf = stored['models']['tfidf']
+    return {
+        'df2': df2,
+        'genre_names': records['genre_names'],
+        'genre_mask': arrays['genre_mask'],
+        'tfidf': tfidf,
+        'tfidf_matrix': artifacts.load_sparse(arrays, 'tfidf', len(tfidf.vocabulary_)),
+        'neighbor_ids': arrays['neighbor_ids'],
+        'neighbor_scores': arrays['neighbor_scores'],
+        'svd': stored['models'].get('svd'),
+        'ann_index': IVFIndex.from_arrays(arrays) if 'ann_embeddings' in arrays else None,
+        'title_index': TitleIndex.from_artifacts(records['name'], arrays['popularity'], arrays, records),
+        'version': stored['manifest']['version'],
+    }
+
+model = load_model()
+MODEL_SOURCE = 'artifacts' if model is not None else 'csv'
+if model is None:
+    model = build_model()
+MODEL_VERSION = model['version']
+
+df2 = model['df2']
+tfidf = model['tfidf']
+tfidf_matrix = model['tfidf_matrix']
+neighbor_ids, neighbor_scores = model['neighbor_ids'], model['neighbor_scores']
+ann_index = model['ann_index']
+title_index = model['title_index']
+
+m = df2['vote_count'].quantile(VOTE_QUANTILE)
 C = df2['vote_average'].mean()
 
 def weight_average(x):
-    v = x['vote_count']
-    R = x['vote_average']
-    return (v/(v+m))*R + (m/(v+m))*C
+    return weighted_rating(x['vote_count'], x['vote_average'], m, C)
+
+# Weighted rating of every row in one vectorized pass
+ratings = weighted_rating(df2['vote_count'].to_numpy(np.float64), df2['vote_average'].to_numpy(np.float64), m, C)
+qualified = df2['vote_count'].to_numpy() >= m
 
-q_tvshows = df2.copy().loc[df2['vote_count'] >= m]
-q_tvshows['score'] = q_tvshows.apply(weight_average , axis = 1)
-q_tvshows = q_tvshows.sort_values('score' , ascending = False)
-tfidf = TfidfVectorizer( stop_words='english' )
-df2['overview'] = df2['overview'].fillna('')
-tfidf_matrix = tfidf.fit_transform(df2['overview'])
-tfidf_matrix_sparse = csr_matrix(tfidf_matrix)
+q_tvshows = df2.loc[qualified].assign(score=ratings[qualified]).sort_values('score', ascending=False)
 
-tfidf_matrix_subset = tfidf_matrix[:30000]
-cosine_sim = linear_kernel(tfidf_matrix_subset, tfidf_matrix_subset)
+# Precomputed top lists, overall and per genre, for /api/charts
+genre_names, genre_mask = model['genre_names'], np.asarray(model['genre_mask'])
+charts, chart_genres = top_charts(ratings, qualified, compact.genre_lists(genre_names, genre_mask))
+
+# Genre mixing (titles carrying several genres at once) over per-show bitmasks
+genre_mixer = GenreMixer(genre_names, genre_mask, {'rating': ratings, 'popularity': df2['popularity']})
 
 indices = pd.Series(df2.index, index=df2['name']).drop_duplicates()
-def get_recommendations(title,cosine_sim = cosine_sim):
-    idx = indices[title]
-    sim_scores = list(enumerate(cosine_sim[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-    sim_scores = sim_scores[1:11]
-    tvshow_indices = [i[0] for i in sim_scores]
+
+# Memoized on (resolved row, model version), see Movie_Recommendations
+RESULT_CACHE_SIZE = int(os.environ.get('ULTRON_RESULT_CACHE', 4096))
+WARM_TOP_N = int(os.environ.get('ULTRON_WARM_TOP_N', 0))
+
+# Shows only have the overview model (no credits data for the TV catalog)
+MODES = ('overview',)
+
+@lru_cache(maxsize=RESULT_CACHE_SIZE)
+def recommend_index(idx, version):
+    return tuple(neighbor_ids[idx, :10].tolist())
+
+def resolve(title):
+    with metrics.span('shows.resolve'):
+        idx = title_index.resolve(title)
+    if idx is None:
+        raise ValueError(f"Show '{title}' not found in database. Please check the spelling or try a different show.")
+    return idx
+
+def recommendations_for(idx, mode='overview'):
+    with metrics.span('shows.rank'):
+        tvshow_indices = list(recommend_index(idx, MODEL_VERSION))
     return df2['name'].iloc[tvshow_indices]
 
+def get_recommendations(title, mode='overview'):
+    if mode not in MODES:
+        raise ValueError(f"Unknown model '{mode}'. Choose one of: {', '.join(MODES)}.")
+    return recommendations_for(resolve(title), mode)
+
+def similar_rows(rows, k=10, mode='overview'):
+    # Neighbours of many rows at once: a gather from the neighbour table when k
+    # fits in it, else one batched sparse product against the whole catalog
+    # (or ANN searches with the ann backend)
+    rows = np.asarray(rows, dtype=np.int64)
+    if k <= neighbor_ids.shape[1]:
+        return np.asarray(neighbor_ids[rows, :k]), np.asarray(neighbor_scores[rows, :k])
+    if ann_index is not None:
+        return ann_index.search_rows(rows, k, tfidf_matrix)
+    return query_topk(tfidf_matrix, rows, k)
+
+def max_k(mode='overview'):
+    # Any k: past the neighbour table similar_rows scores the whole catalog
+    return None
+
+def profile_rows(rows, weights, offset=0, limit=10, mode='overview'):
+    # One page of recommendations for a taste profile, seeds excluded (see
+    # Movie_Recommendations.profile_rows); exact TF-IDF scores with either backend
+    with metrics.span('shows.profile'):
+        return page_topk(profile_scores(tfidf_matrix, rows, weights), offset, limit, exclude=rows)
+
+def top_rated(genre=None, n=10):
+    # Best rated row ids overall or for one genre; None for an unknown genre
+    chart = charts.get(genre_key(genre) if genre else '')
+    return None if chart is None else chart[:n]
+
+def ingest(items):
+    # Append shows without a refit (see Movie_Recommendations.ingest)
+    # items: [{"title", "overview", "genres": [...], "vote_count", "vote_average", "popularity"}]
+    first_id = catalog.next_id(SOURCES[0], 'id', len(df2))
+    shows = [{'id': first_id + i, 'name': item['title'], 'original_name': item['title'],
+              'overview': item.get('overview', ''), 'genres': ', '.join(str(g) for g in item.get('genres') or []),
+              'vote_count': float(item.get('vote_count') or 0), 'vote_average': float(item.get('vote_average') or 0),
+              'popularity': float(item.get('popularity') or 0)} for i, item in enumerate(items)]
+    new = pd.DataFrame(shows)
+    new['overview'] = new['overview'].fillna('')
+
+    n_old = len(df2)
+    new_tfidf = tfidf.transform(new['overview']).astype(np.float32)
+    all_tfidf, ids, scores = extend_neighbors(neighbor_ids, neighbor_scores, tfidf_matrix, new_tfidf, BLOCK_SIZE)
+    frame = pd.concat([df2, compact.catalog_frame('name', new['name'], new)], ignore_index=True)
+    new_genres = [split_genres(genres) for genres in new['genres']]
+    # Existing genre bits keep their positions; unseen genres are appended
+    names = list(genre_names) + sorted({g for genres in new_genres for g in genres} - set(genre_names))
+    masks = np.concatenate([genre_mask, bitmasks(new_genres, names)[1]])
+    svd, index = model['svd'], ann_index
+    if index is not None:
+        # New rows join their closest existing lists; the clustering is kept
+        index = index.add(unit_rows(svd.transform(new_tfidf)).astype(np.float32))
+
+    catalog.append_rows(SOURCES[0], shows)
+    save_model({
+        'df2': frame,
+        'genre_names': names,
+        'genre_mask': masks,
+        'tfidf': tfidf,
+        'tfidf_matrix': all_tfidf,
+        'neighbor_ids': ids,
+        'neighbor_scores': scores,
+        'svd': svd,
+        'ann_index': index,
+        'title_index': TitleIndex(frame['name'], frame['popularity']),
+    })
+    return list(range(n_old, len(frame)))
+
+def result_cache_info():
+    return recommend_index.cache_info()
+
+def catalog_memory():
+    arrays = {'neighbor_ids': neighbor_ids, 'neighbor_scores': neighbor_scores, 'tfidf_matrix': tfidf_matrix,
+              'genre_mask': genre_mask, 'ratings': ratings, 'title_postings': title_index.postings}
+    if ann_index is not None:
+        arrays['ann_embeddings'] = ann_index.embeddings
+    return compact.memory_report(df2, arrays)
+
+def warm_cache(top_n=WARM_TOP_N):
+    # Precompute results for the top_n best rated shows of the q_tvshows chart
+    for idx in q_tvshows.index[:top_n]:
+        recommend_index(int(idx), MODEL_VERSION)
+
+if WARM_TOP_N:
+    warm_cache()
+
 if __name__ == "__main__":
-    print(get_recommendations('Breaking Bad')).tolist()
\ No newline at end of file
+    print(get_recommendations('Breaking Bad')).tolist()
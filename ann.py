@@ -0,0 +1,137 @@
+import os
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.decomposition import TruncatedSVD
+
+# Approximate nearest neighbours for catalogs too large for the exact blockwise
+# product in neighbors.py:
+#   1. LSA: TruncatedSVD of the TF-IDF matrix -> dense, L2-normalised float32 rows
+#   2. IVF: spherical k-means splits the rows into N_LISTS inverted lists; a
+#      query only scores the rows of its N_PROBE closest lists
+#   3. the best REFINE candidates are re-scored with the exact TF-IDF cosine
+# Recall@k against the exact result is traded for speed with N_PROBE and REFINE
+# (see bench_ann.py).
+N_COMPONENTS = int(os.environ.get('ULTRON_ANN_DIMS', 128))
+N_LISTS = int(os.environ.get('ULTRON_ANN_LISTS', 0))  # 0 = about sqrt(rows)
+N_PROBE = int(os.environ.get('ULTRON_ANN_PROBE', 4))
+REFINE = int(os.environ.get('ULTRON_ANN_REFINE', 16))  # exact re-score of REFINE * k candidates
+KMEANS_ITERS = 10
+KMEANS_SAMPLE = 50000
+ARRAY_KEYS = ['embeddings', 'centroids', 'list_offsets', 'list_rows']
+
+def lsa_embeddings(matrix, n_components=N_COMPONENTS, seed=0):
+    # (fitted TruncatedSVD, float32 unit-length embeddings)
+    n_components = max(1, min(n_components, matrix.shape[1] - 1))
+    svd = TruncatedSVD(n_components=n_components, algorithm='randomized', random_state=seed)
+    embeddings = svd.fit_transform(matrix).astype(np.float32)
+    return svd, unit_rows(embeddings)
+
+def unit_rows(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+def _assign(embeddings, centroids, block_size=20000):
+    # Closest centroid (by cosine) of every row, in blocks to bound memory
+    labels = np.empty(len(embeddings), np.int32)
+    for start in range(0, len(embeddings), block_size):
+        labels[start:start + block_size] = np.argmax(embeddings[start:start + block_size] @ centroids.T, axis=1)
+    return labels
+
+def spherical_kmeans(embeddings, n_lists, iters=KMEANS_ITERS, sample=KMEANS_SAMPLE, seed=0):
+    # Lloyd iterations on a sample of rows; centroids are kept at unit length
+    rng = np.random.default_rng(seed)
+    train = embeddings[rng.choice(len(embeddings), min(sample, len(embeddings)), replace=False)]
+    centroids = train[rng.choice(len(train), n_lists, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(train, centroids)
+        members = csr_matrix((np.ones(len(train), np.float32), (labels, np.arange(len(train)))),
+                             shape=(n_lists, len(train)))
+        sums = np.asarray(members @ train)
+        empty = np.asarray(members.sum(axis=1)).ravel() == 0
+        # Re-seed empty lists with random rows so every list stays in use
+        sums[empty] = train[rng.choice(len(train), int(empty.sum()), replace=False)]
+        centroids = unit_rows(sums).astype(np.float32)
+    return centroids
+
+class IVFIndex:
+    def __init__(self, embeddings, centroids, list_offsets, list_rows):
+        self.embeddings = embeddings
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+
+    @classmethod
+    def build(cls, embeddings, n_lists=N_LISTS, seed=0):
+        n_lists = n_lists or int(np.sqrt(len(embeddings)))
+        n_lists = max(1, min(n_lists, len(embeddings)))
+        centroids = spherical_kmeans(embeddings, n_lists, seed=seed)
+        labels = _assign(embeddings, centroids)
+        list_rows = np.argsort(labels, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(n_lists + 1, np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=list_offsets[1:])
+        return cls(embeddings, centroids, list_offsets, list_rows)
+
+    def add(self, embeddings):
+        # New index with rows appended to their closest existing lists (centroids
+        # are not retrained; rebuild the model to re-cluster)
+        labels = np.empty(len(self.list_rows), np.int32)
+        labels[self.list_rows] = np.repeat(np.arange(len(self.centroids), dtype=np.int32), np.diff(self.list_offsets))
+        labels = np.concatenate([labels, _assign(embeddings, self.centroids)])
+        list_rows = np.argsort(labels, kind='stable').astype(np.int32)
+        list_offsets = np.zeros(len(self.centroids) + 1, np.int64)
+        np.cumsum(np.bincount(labels, minlength=len(self.centroids)), out=list_offsets[1:])
+        return IVFIndex(np.vstack([self.embeddings, embeddings]), self.centroids, list_offsets, list_rows)
+
+    def to_arrays(self):
+        return {f"ann_{k}": getattr(self, k) for k in ARRAY_KEYS}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(*(arrays[f"ann_{k}"] for k in ARRAY_KEYS))
+
+    def nbytes(self):
+        return sum(getattr(self, k).nbytes for k in ARRAY_KEYS)
+
+    def candidates(self, query, n_probe=N_PROBE):
+        # Rows of the n_probe lists whose centroids are closest to query
+        n_probe = min(n_probe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        return np.concatenate([self.list_rows[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists])
+
+    def search_rows(self, rows, k, matrix=None, n_probe=N_PROBE, refine=REFINE):
+        # Approximate top-k neighbours of catalog rows (self excluded), best first.
+        # With matrix (the L2-normalised TF-IDF rows) the best refine * k
+        # candidates are re-scored exactly; otherwise LSA scores are returned.
+        ids = np.full((len(rows), k), -1, np.int32)
+        scores = np.full((len(rows), k), -np.inf, np.float32)
+        for i, row in enumerate(rows):
+            found, found_scores = self._search(self.embeddings[row], k, matrix, n_probe, refine, row)
+            ids[i, :len(found)], scores[i, :len(found)] = found, found_scores
+        return ids, scores
+
+    def _search(self, query, k, matrix, n_probe, refine, query_row):
+        rows = self.candidates(query, n_probe)
+        # Small lists: widen the probe until there are enough candidates
+        while len(rows) <= k and n_probe < len(self.centroids):
+            n_probe *= 2
+            rows = self.candidates(query, n_probe)
+        rows = rows[rows != query_row]
+        scores = self.embeddings[rows] @ query
+        keep = min(len(rows), max(k, refine * k) if matrix is not None else k)
+        if keep < len(rows):
+            top = np.argpartition(-scores, keep - 1)[:keep]
+            rows, scores = rows[top], scores[top]
+        if matrix is not None:
+            scores = (matrix[rows] @ matrix[query_row].T).toarray().ravel().astype(np.float32)
+        order = np.lexsort((rows, -scores))[:k]
+        return rows[order], scores[order]
+
+def ann_neighbors(matrix, k, n_components=N_COMPONENTS, n_lists=N_LISTS, n_probe=N_PROBE, refine=REFINE):
+    # Drop-in for neighbors.topk_neighbors on large catalogs:
+    # (svd, index, ids, scores) with the neighbour table built through the index
+    matrix = csr_matrix(matrix, dtype=np.float32)
+    svd, embeddings = lsa_embeddings(matrix, n_components)
+    index = IVFIndex.build(embeddings, n_lists)
+    k = max(1, min(k, matrix.shape[0] - 1))
+    ids, scores = index.search_rows(np.arange(matrix.shape[0]), k, matrix, n_probe, refine)
+    return svd, index, ids, scores
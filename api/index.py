@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import sys
 import os
 
@@ -20,9 +20,10 @@ except (ImportError, ModuleNotFoundError):
     API_KEY = os.environ.get('SERPAPI_KEY', '')
 
 # Import project modules
-import Movie_Recommendations
-import Shows_Recommendations
-import serpapi
+import engines
+import metrics
+import poster_fetch
+from api_routes import api
 
 # Initialize Flask app with correct paths
 # Templates are in templates/frontend/ relative to project root
@@ -35,57 +36,59 @@ app = Flask(
     static_folder=STATIC_FOLDER,
     static_url_path='/static'
 )
+app.register_blueprint(api)
+# Models load on first use; ULTRON_WARMUP loads them in the background instead
+engines.start_warmup()
+# ULTRON_STREAM_POSTERS=1: render recommendation pages as soon as the titles are
+# known and push posters and available_on links over /stream/<kind>
+# (Server-Sent Events) instead of waiting for every lookup
+STREAM_POSTERS = os.environ.get('ULTRON_STREAM_POSTERS', '0') == '1'
+app.jinja_env.globals['STREAM_POSTERS'] = STREAM_POSTERS
 
-def GET_MoviePosters(movie):
-    movies = Movie_Recommendations.get_recommendations(movie).tolist()
-    movie_dict = {}
-    for i in movies:
-        # Search specifically for movie poster to avoid book covers
-        params = {
-        "q": f"{i} movie poster",
-        "engine": "google_images",
-        "hl": 'en',
-        "ijn": "0",
-        "api_key": API_KEY
-        }
-        search = serpapi.search(params)
-        if 'images_results' in search and search['images_results']:
-            # Try to find a poster image (look through first few results)
-            image_link = None
-            for result in search['images_results'][:5]:
-                # Check if it's likely a poster (has "poster" in title or looks like a poster)
-                title = result.get('title', '').lower()
-                if 'poster' in title or 'movie' in title or 'film' in title:
-                    image_link = result.get('original') or result.get('link')
-                    break
-            # If no poster found, use first result
-            if not image_link:
-                image_link = search['images_results'][0].get('original') or search['images_results'][0].get('link')
-            movie_dict[i] = image_link
-        else:
-            movie_dict[i] = "No Image Found"
-    
-    return movie_dict
+def GET_MoviePosters(movie, model='overview'):
+    # model: overview (plot), credits (cast/crew/keywords) or hybrid
+    movies = engines.movies.get_recommendations(movie, model).tolist()
+    if STREAM_POSTERS:
+        return dict.fromkeys(movies, poster_fetch.LOADING_IMAGE)
+    # Cached posters come back inline; the rest are fetched concurrently and
+    # slow ones fall back to "No Image Found"
+    with metrics.span('movies.posters'):
+        return poster_fetch.movie_posters(movies, API_KEY)
 
 def GET_ShowsPosters(show):
-    shows = Shows_Recommendations.get_recommendations(show).tolist()
-    show_dict = {}
-    for i in shows:
-        params = {
-        "q": i,
-        "engine": "google_images",
-        "hl": 'en',
-        "ijn": "0",
-        "api_key": API_KEY
-        }
-        search = serpapi.search(params)
-        if 'images_results' in search and search['images_results']:
-            image_link = search['images_results'][0]['original']
-            show_dict[i] = image_link
+    shows = engines.shows.get_recommendations(show).tolist()
+    if STREAM_POSTERS:
+        return dict.fromkeys(shows, poster_fetch.LOADING_IMAGE)
+    with metrics.span('shows.posters'):
+        return poster_fetch.show_images(shows, API_KEY)
+
+@app.route('/stream/<kind>', methods=['GET'])
+def stream(kind):
+    # Server-Sent Events for a recommendation page: titles, then each poster (and
+    # available_on links with available=1) as soon as its lookup resolves
+    try:
+        if kind == 'movies':
+            titles = engines.movies.get_recommendations(request.args.get('movie_name', ''), request.args.get('model', 'overview')).tolist()
+        elif kind == 'shows':
+            titles = engines.shows.get_recommendations(request.args.get('show_name', '')).tolist()
         else:
-            show_dict[i] = "No Image Found"
-    
-    return show_dict
+            return jsonify({'error': 'kind must be movies or shows'}), 404
+    except ValueError as e:
+        return Response(poster_fetch.sse('error', {'error': str(e)}), mimetype='text/event-stream')
+    events = poster_fetch.page_events(kind, titles, API_KEY, request.args.get('available') == '1')
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Readiness: which recommender engines are loaded, and whether warmup is done
+    status = engines.health()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    # Stage timings, request latency, cache and external call counters, memory
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/', methods=['GET'])
 def index():
@@ -101,7 +104,7 @@ def choice():
         movie_name = request.form.get('movie_name')
         if movie_name:
             try:
-                posters = GET_MoviePosters(movie_name)
+                posters = GET_MoviePosters(movie_name, request.values.get('model', 'overview'))
                 return render_template('frontend/Movies.html', posters=posters, movie_name=movie_name)
             except ValueError as e:
                 error_msg = str(e)
@@ -118,7 +121,7 @@ def movies():
         movie_name = request.form.get('movie_name')
         if movie_name:
             try:
-                posters = GET_MoviePosters(movie_name)
+                posters = GET_MoviePosters(movie_name, request.values.get('model', 'overview'))
                 return render_template('frontend/Movies.html', posters=posters, movie_name=movie_name)
             except ValueError as e:
                 return render_template('frontend/Movies.html', error=str(e), movie_name=movie_name), 400
@@ -129,7 +132,7 @@ def movies():
     movie_name = request.args.get('movie_name')
     if movie_name:
         try:
-            posters = GET_MoviePosters(movie_name)
+            posters = GET_MoviePosters(movie_name, request.values.get('model', 'overview'))
             return render_template('frontend/Movies.html', posters=posters, movie_name=movie_name)
         except Exception as e:
             return render_template('frontend/Movies.html', error=f"Error: {str(e)}", movie_name=movie_name), 400
@@ -0,0 +1,215 @@
+import os
+import hmac
+from flask import Blueprint, jsonify, request
+import engines
+import catalog
+import metrics
+
+# JSON endpoints shared by app.py (local) and api/index.py (Vercel)
+api = Blueprint('api', __name__, url_prefix='/api')
+
+@api.before_app_request
+def start_timing():
+    metrics.start_request()
+
+@api.after_app_request
+def finish_timing(response):
+    # Request latency per route (not per raw path, which would explode the
+    # label set) and, with ULTRON_SERVER_TIMING=1, the Server-Timing header
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    timing = metrics.end_request(endpoint, response.status_code)
+    if timing:
+        response.headers['Server-Timing'] = timing
+    return response
+
+# Lazily loaded: a catalog's model is only loaded when a request asks for it
+CATALOGS = {name: engines.ENGINES[name] for name in engines.CATALOG_NAMES}
+
+@api.route('/suggest', methods=['GET'])
+def suggest():
+    # Typeahead over the prebuilt title index: /api/suggest?q=brea&kind=shows
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('kind', 'movies')
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    if kind not in CATALOGS:
+        return jsonify({'error': f"kind must be one of {', '.join(CATALOGS)}"}), 400
+    results = CATALOGS[kind].title_index.suggest(query, limit) if query else []
+    return jsonify({'query': query, 'kind': kind, 'results': results})
+
+MAX_BATCH = 10000
+MAX_K = 100
+
+@api.route('/recommend', methods=['POST'])
+def recommend():
+    # Batch scoring: {"titles": [...], "kind": "movies", "model": "overview", "k": 10}.
+    # Every title is resolved first and all rows are scored together in one call.
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'request body must be a JSON object'}), 400
+    titles = body.get('titles')
+    kind = body.get('kind', 'movies')
+    k = body.get('k', 10)
+    mode = body.get('model', 'overview')
+    if kind not in CATALOGS:
+        return jsonify({'error': f"kind must be one of {', '.join(CATALOGS)}"}), 400
+    engine = CATALOGS[kind].load()
+    if mode not in engine.MODES:
+        return jsonify({'error': f"model must be one of {', '.join(engine.MODES)}"}), 400
+    if not isinstance(titles, list) or not all(isinstance(t, str) for t in titles):
+        return jsonify({'error': 'titles must be a list of strings'}), 400
+    if len(titles) > MAX_BATCH:
+        return jsonify({'error': f"at most {MAX_BATCH} titles per request"}), 400
+    if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= MAX_K:
+        return jsonify({'error': f"k must be an integer between 1 and {MAX_K}"}), 400
+    if engine.max_k(mode) is not None and k > engine.max_k(mode):
+        return jsonify({'error': f"k must be at most {engine.max_k(mode)} with model={mode}"}), 400
+    rows = [engine.title_index.resolve(t) for t in titles]
+    found = [row for row in rows if row is not None]
+    ids, scores = engine.similar_rows(found, k, mode) if found else ([], [])
+    names = engine.title_index.titles
+    # Unresolved titles get the top rated chart instead (same list for all of them)
+    fallback = [chart_entry(engine, r) for r in engine.top_rated(n=k)] if len(found) < len(titles) else []
+    results, i = [], 0
+    for title, row in zip(titles, rows):
+        if row is None:
+            results.append({'query': title, 'error': 'not found', 'fallback': fallback})
+            continue
+        neighbors = [{'id': int(n), 'title': names[n], 'score': round(float(s), 4)} for n, s in zip(ids[i], scores[i])]
+        results.append({'query': title, 'id': int(row), 'title': names[row], 'neighbors': neighbors})
+        i += 1
+    return jsonify({'kind': kind, 'model': mode, 'k': k, 'results': results})
+
+MAX_SEEDS = 1000
+
+def parse_seeds(seeds, name):
+    # ["Title", {"title": "Title", "weight": 2.0}, ...] -> [(title, weight)]
+    if not isinstance(seeds, list) or len(seeds) > MAX_SEEDS:
+        raise ValueError(f"{name} must be a list of at most {MAX_SEEDS} titles")
+    parsed = []
+    for seed in seeds:
+        if isinstance(seed, dict):
+            title, weight = seed.get('title'), seed.get('weight', 1.0)
+        else:
+            title, weight = seed, 1.0
+        if not isinstance(title, str) or isinstance(weight, bool) or not isinstance(weight, (int, float)) or not weight > 0:
+            raise ValueError(f"each {name} entry must be a title or {{\"title\": ..., \"weight\": <positive number>}}")
+        parsed.append((title, float(weight)))
+    return parsed
+
+@api.route('/profile', methods=['POST'])
+def profile():
+    # Taste profile: {"seeds": ["Avatar", {"title": "Alien", "weight": 2}], "negative": ["Cars"],
+    # "kind": "movies", "model": "overview", "offset": 0, "limit": 10}. The seeds are
+    # folded into one centroid and the catalog is scored once, seeds excluded.
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'request body must be a JSON object'}), 400
+    kind = body.get('kind', 'movies')
+    mode = body.get('model', 'overview')
+    offset, limit = body.get('offset', 0), body.get('limit', 10)
+    if kind not in CATALOGS:
+        return jsonify({'error': f"kind must be one of {', '.join(CATALOGS)}"}), 400
+    engine = CATALOGS[kind].load()
+    if mode not in engine.MODES:
+        return jsonify({'error': f"model must be one of {', '.join(engine.MODES)}"}), 400
+    try:
+        seeds = parse_seeds(body.get('seeds'), 'seeds')
+        negative = parse_seeds(body.get('negative', []), 'negative')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        return jsonify({'error': 'offset must be a non-negative integer'}), 400
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= MAX_K:
+        return jsonify({'error': f"limit must be an integer between 1 and {MAX_K}"}), 400
+    names = engine.title_index.titles
+    used, rows, weights, unresolved = {'seeds': [], 'negative': []}, [], [], []
+    for group, sign, entries in (('seeds', 1.0, seeds), ('negative', -1.0, negative)):
+        for title, weight in entries:
+            row = engine.title_index.resolve(title)
+            if row is None:
+                unresolved.append(title)
+                continue
+            rows.append(row)
+            weights.append(sign * weight)
+            used[group].append({'query': title, 'id': int(row), 'title': names[row], 'weight': weight})
+    if not used['seeds']:
+        return jsonify({'error': 'none of the seed titles were found', 'unresolved': unresolved}), 404
+    ids, scores = engine.profile_rows(rows, weights, offset, limit, mode)
+    results = [{'id': int(r), 'title': names[r], 'score': round(float(s), 4)} for r, s in zip(ids, scores)]
+    return jsonify({'kind': kind, 'model': mode, 'offset': offset, 'limit': limit, 'seeds': used['seeds'],
+                    'negative': used['negative'], 'unresolved': unresolved, 'results': results})
+
+def chart_entry(engine, row):
+    return {'id': int(row), 'title': engine.title_index.titles[row], 'score': round(float(engine.ratings[row]), 3)}
+
+@api.route('/charts', methods=['GET'])
+def charts():
+    # Precomputed top rated lists: /api/charts?kind=movies&genre=Science Fiction&limit=20
+    kind = request.args.get('kind', 'movies')
+    genre = request.args.get('genre', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    if kind not in CATALOGS:
+        return jsonify({'error': f"kind must be one of {', '.join(CATALOGS)}"}), 400
+    engine = CATALOGS[kind].load()
+    rows = engine.top_rated(genre, limit)
+    if rows is None:
+        return jsonify({'error': f"unknown genre '{genre}'", 'genres': sorted(engine.chart_genres.values())}), 404
+    return jsonify({'kind': kind, 'genre': genre or None, 'results': [chart_entry(engine, r) for r in rows]})
+
+# Catalog ingestion changes the served model, so it is off unless a token is set
+INGEST_TOKEN = os.environ.get('ULTRON_INGEST_TOKEN', '')
+
+@api.route('/catalog', methods=['POST'])
+def add_to_catalog():
+    # {"kind": "movies", "items": [{"title": ..., "overview": ..., "genres": [...]}]}
+    # with header X-Ingest-Token: $ULTRON_INGEST_TOKEN
+    if not INGEST_TOKEN or not hmac.compare_digest(request.headers.get('X-Ingest-Token', ''), INGEST_TOKEN):
+        return jsonify({'error': 'catalog ingestion is not enabled for this client'}), 403
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'request body must be a JSON object'}), 400
+    kind = body.get('kind', 'movies')
+    if kind not in CATALOGS:
+        return jsonify({'error': f"kind must be one of {', '.join(CATALOGS)}"}), 400
+    try:
+        rows = catalog.ingest(kind, body.get('items'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    engine = CATALOGS[kind].load()
+    added = [{'id': r, 'title': engine.title_index.titles[r]} for r in rows]
+    return jsonify({'kind': kind, 'version': engine.MODEL_VERSION, 'added': added})
+
+MAX_TEXTS = 5000
+
+@api.route('/sentiment', methods=['POST'])
+def sentiment():
+    # Emotion of each review: {"texts": ["...", ...]}
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': 'request body must be a JSON object'}), 400
+    texts = body.get('texts')
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({'error': 'texts must be a list of strings'}), 400
+    if len(texts) > MAX_TEXTS:
+        return jsonify({'error': f"at most {MAX_TEXTS} texts per request"}), 400
+    predictions = engines.sentiment.predict(texts)
+    return jsonify({'version': engines.sentiment.MODEL_VERSION,
+                    'results': [{'emotion': emotion, 'score': score} for emotion, score in predictions]})
+
+@api.route('/genre-mix', methods=['GET'])
+def genre_mix():
+    # Titles with every genre: /api/genre-mix?genres=action,comedy&exclude=horror&kind=movies&rank=popularity
+    kind = request.args.get('kind', 'movies')
+    include = [g.strip() for g in request.args.get('genres', '').split(',') if g.strip()]
+    exclude = [g.strip() for g in request.args.get('exclude', '').split(',') if g.strip()]
+    rank = request.args.get('rank', 'rating')
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    if kind not in CATALOGS:
+        return jsonify({'error': f"kind must be one of {', '.join(CATALOGS)}"}), 400
+    engine = CATALOGS[kind].load()
+    try:
+        rows = engine.genre_mixer.rows(include, exclude, rank, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    results = [{'id': r, 'title': engine.title_index.titles[r], 'rating': round(float(engine.ratings[r]), 3)} for r in rows]
+    return jsonify({'kind': kind, 'genres': include, 'exclude': exclude, 'rank': rank, 'results': results})
@@ -0,0 +1,116 @@
+import os
+import json
+import time
+import shutil
+import pickle
+import hashlib
+import numpy as np
+from scipy.sparse import csr_matrix
+
+# Prebuilt model artifacts written by build.py and memory-mapped at import time.
+# Bump SCHEMA_VERSION whenever the layout of an artifact directory changes.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACTS_DIR = os.environ.get('ULTRON_ARTIFACTS_DIR', os.path.join(SCRIPT_DIR, 'artifacts'))
+SCHEMA_VERSION = 8
+
+# sha1 of each source by (path, size, mtime), so a process hashes a file once
+_digests = {}
+
+def file_digest(path):
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _digests:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+def source_stamp(sources):
+    # Fingerprint of the datasets an artifact was built from (name, size and
+    # content hash: an edit that keeps the size still makes the build stale,
+    # a copy that keeps the content does not). Sources that are not deployed
+    # (artifact-only installs) are left out.
+    return {os.path.basename(p): {'size': os.path.getsize(p), 'sha1': file_digest(p)}
+            for p in sources if os.path.exists(p)}
+
+def dataset_version(stamp, variant=None):
+    # variant: how the model was built from the datasets (e.g. the shows
+    # backend), so builds that differ only in that never share a version
+    digest = hashlib.sha1(json.dumps(stamp, sort_keys=True).encode()).hexdigest()
+    return f"{SCHEMA_VERSION}-{digest[:12]}" + (f"-{variant}" if variant else '')
+
+def save(name, sources, arrays=None, records=None, models=None, info=None, variant=None):
+    # arrays -> <key>.npy (memory-mapped on load), records -> metadata.json,
+    # models -> <key>.pkl (fitted vectorizers). Written to a temp dir and
+    # swapped in so a running server never sees a half-written build.
+    arrays, records, models = arrays or {}, records or {}, models or {}
+    stamp = source_stamp(sources)
+    target = os.path.join(ARTIFACTS_DIR, name)
+    tmp = f"{target}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for key, value in arrays.items():
+        np.save(os.path.join(tmp, f"{key}.npy"), np.ascontiguousarray(value))
+    with open(os.path.join(tmp, 'metadata.json'), 'w') as f:
+        json.dump(records, f)
+    for key, value in models.items():
+        with open(os.path.join(tmp, f"{key}.pkl"), 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    manifest = {
+        'name': name,
+        'schema': SCHEMA_VERSION,
+        'version': dataset_version(stamp, variant),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'sources': stamp,
+        'arrays': sorted(arrays),
+        'models': sorted(models),
+        'info': info or {},
+    }
+    with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    old = f"{target}.old-{os.getpid()}"
+    if os.path.exists(target):
+        os.replace(target, old)
+    os.replace(tmp, target)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+def read_manifest(name):
+    path = os.path.join(ARTIFACTS_DIR, name, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def is_current(manifest, sources):
+    if manifest is None or manifest.get('schema') != SCHEMA_VERSION:
+        return False
+    stamp = source_stamp(sources)
+    return all(manifest['sources'].get(k) == v for k, v in stamp.items())
+
+def load(name, sources):
+    # Returns None when there is no build or it is stale for the given datasets.
+    manifest = read_manifest(name)
+    if not is_current(manifest, sources):
+        return None
+    folder = os.path.join(ARTIFACTS_DIR, name)
+    arrays = {key: np.load(os.path.join(folder, f"{key}.npy"), mmap_mode='r') for key in manifest['arrays']}
+    with open(os.path.join(folder, 'metadata.json')) as f:
+        records = json.load(f)
+    models = {}
+    for key in manifest['models']:
+        with open(os.path.join(folder, f"{key}.pkl"), 'rb') as f:
+            models[key] = pickle.load(f)
+    return {'manifest': manifest, 'arrays': arrays, 'records': records, 'models': models}
+
+def sparse_arrays(prefix, matrix):
+    # CSR matrix -> {prefix_data, prefix_indices, prefix_indptr} for save()
+    matrix = csr_matrix(matrix, dtype=np.float32)
+    return {f"{prefix}_data": matrix.data, f"{prefix}_indices": matrix.indices, f"{prefix}_indptr": matrix.indptr}
+
+def load_sparse(arrays, prefix, n_cols):
+    # Rebuild a CSR matrix on top of the memory-mapped parts (no copy)
+    data, indices, indptr = (arrays[f"{prefix}_{part}"] for part in ('data', 'indices', 'indptr'))
+    return csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, n_cols), copy=False)
@@ -0,0 +1,226 @@
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import threading
+from functools import partial
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+import engines
+import metrics
+import poster_fetch
+from poster_cache import cache, MISS
+from title_index import normalize_title
+
+# Async entry point for any ASGI server:
+#   uvicorn asgi:app --port 5001        (pip install uvicorn; not needed by app.py)
+# GET /async/recommend is served natively. While a title trends, identical
+# concurrent requests are coalesced (single flight): N requests for the same
+# resolved title run the recommender once, and N pages needing the same poster
+# make one SerpAPI call. The SerpAPI client is blocking, so lookups run on a
+# bounded thread pool and never block the event loop. Every other route (pages,
+# /api/*, /stream, /metrics) is the Flask app, run through a WSGI bridge.
+try:
+    API_KEY = os.environ.get('SERPAPI_KEY')
+    if not API_KEY:
+        from api_key import API_KEY
+except ImportError:
+    API_KEY = ''
+
+CATALOGS = {name: engines.ENGINES[name] for name in engines.CATALOG_NAMES}
+# Threads for SerpAPI lookups and for the Flask routes behind the bridge
+_lookups = ThreadPoolExecutor(max_workers=poster_fetch.FETCH_WORKERS, thread_name_prefix='async-serpapi')
+_wsgi = ThreadPoolExecutor(max_workers=int(os.environ.get('ULTRON_ASGI_THREADS', 32)), thread_name_prefix='wsgi')
+metrics.HELP['ultron_singleflight_total'] = ('counter', 'Async work by flight; followers waited on a leader instead of repeating it')
+
+class SingleFlight:
+    # Concurrent do(key, fn) calls share one run of fn: the first caller (the
+    # leader) starts it on the executor, later callers await the same future.
+    # A caller that gives up (timeout, disconnect) does not cancel it for the rest.
+    def __init__(self, name, executor=None):
+        self.name = name
+        self.executor = executor
+        self._flights = {}
+
+    def _land(self, key, future):
+        self._flights.pop(key, None)
+        if not future.cancelled():
+            future.exception()  # retrieved here, so an unawaited failure is not logged
+
+    async def do(self, key, fn):
+        future = self._flights.get(key)
+        if future is None:
+            metrics.inc('ultron_singleflight_total', flight=self.name, role='leader')
+            future = asyncio.get_running_loop().run_in_executor(self.executor, fn)
+            self._flights[key] = future
+            future.add_done_callback(partial(self._land, key))
+        else:
+            metrics.inc('ultron_singleflight_total', flight=self.name, role='follower')
+        return await asyncio.shield(future)
+
+recommend_flights = SingleFlight('recommend')
+poster_flights = SingleFlight('poster', _lookups)
+
+async def lookup(cache_kind, title, fetch, placeholder):
+    # Poster cache first; a miss joins (or starts) the one SerpAPI call for it
+    value = cache.lookup(cache_kind, title, fetch)
+    if value is not MISS:
+        return value
+    try:
+        return await asyncio.wait_for(
+            poster_flights.do((cache_kind, normalize_title(title)), partial(cache.fill, cache_kind, title, fetch)),
+            poster_fetch.FETCH_TIMEOUT)
+    except Exception:
+        return placeholder
+
+async def recommend(params):
+    # GET /async/recommend?title=Avatar&kind=movies&model=overview&posters=1&available=0
+    kind = params.get('kind', 'movies')
+    title = params.get('title', '').strip()
+    mode = params.get('model', 'overview')
+    if kind not in CATALOGS:
+        return 400, {'error': f"kind must be one of {', '.join(CATALOGS)}"}
+    if not title:
+        return 400, {'error': "title is required"}
+    loop = asyncio.get_running_loop()
+    module = await loop.run_in_executor(None, CATALOGS[kind].load)
+    if mode not in module.MODES:
+        return 400, {'error': f"model must be one of {', '.join(module.MODES)}"}
+    try:
+        idx = await loop.run_in_executor(None, module.resolve, title)
+    except ValueError as e:
+        return 404, {'error': str(e)}
+    titles = await recommend_flights.do((kind, idx, mode, module.MODEL_VERSION),
+                                        lambda: module.recommendations_for(idx, mode).tolist())
+    results = [{'title': t} for t in titles]
+    lookups = []
+    if params.get('posters', '1') == '1':
+        cache_kind, fetch = poster_fetch.POSTER_LOOKUPS[kind]
+        fetch = partial(fetch, api_key=API_KEY)
+        lookups += [(result, 'poster', lookup(cache_kind, result['title'], fetch, poster_fetch.NO_IMAGE)) for result in results]
+    if params.get('available') == '1':
+        fetch = partial(poster_fetch.available_on, api_key=API_KEY)
+        lookups += [(result, 'available_on', lookup('available_on', result['title'], fetch, poster_fetch.NOT_AVAILABLE))
+                    for result in results]
+    values = await asyncio.gather(*(coro for _, _, coro in lookups))
+    for (result, field, _), value in zip(lookups, values):
+        result[field] = value
+    return 200, {'query': title, 'match': module.title_index.titles[idx], 'kind': kind, 'model': mode, 'results': results}
+
+ROUTES = {('GET', '/async/recommend'): recommend}
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': str(client[0]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name, value = name.decode('latin-1').upper().replace('-', '_'), value.decode('latin-1')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    # The body is already buffered (chunked uploads included)
+    environ['CONTENT_LENGTH'] = str(len(body))
+    return environ
+
+async def wsgi_bridge(wsgi_app, scope, receive, send):
+    # Run a WSGI app on one pool thread (Flask's streamed responses need the
+    # same thread throughout) and relay its body chunk by chunk, so
+    # /stream/<kind> still streams
+    environ = wsgi_environ(scope, await read_body(receive))
+    loop = asyncio.get_running_loop()
+    chunks, done, stop = asyncio.Queue(), object(), threading.Event()
+    started = {}
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+    def produce():
+        iterable = None
+        try:
+            iterable = wsgi_app(environ, start_response)
+            for chunk in iterable:
+                if stop.is_set():
+                    break  # client went away
+                loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
+            loop.call_soon_threadsafe(chunks.put_nowait, done)
+    producer = loop.run_in_executor(_wsgi, produce)
+    try:
+        while True:
+            chunk = await chunks.get()
+            if chunk is done:
+                break
+            if 'sent' not in started:
+                await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+                started['sent'] = True
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await producer  # re-raises an exception from the app
+        if 'sent' not in started:
+            await send({'type': 'http.response.start', 'status': started['status'], 'headers': started['headers']})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        stop.set()
+
+_flask = {}
+
+def flask_app():
+    # Imported on first use so the async routes work without the page stack
+    if 'app' not in _flask:
+        from app import app as wsgi_app
+        _flask['app'] = wsgi_app
+    return _flask['app']
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                engines.start_warmup()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+    if scope['type'] != 'http':
+        return
+    route = ROUTES.get((scope['method'], scope['path']))
+    if route is None:
+        return await wsgi_bridge(flask_app(), scope, receive, send)
+    started = time.perf_counter()
+    params = {k: v[-1] for k, v in parse_qs(scope.get('query_string', b'').decode()).items()}
+    status, payload = await route(params)
+    await send_json(send, status, payload)
+    metrics.observe('ultron_request_seconds', time.perf_counter() - started, endpoint=scope['path'])
+    metrics.inc('ultron_requests_total', endpoint=scope['path'], status=str(status))
@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+import subprocess
+import numpy as np
+
+# Reproducible performance benchmark: cold start and peak memory of each
+# recommender module, get_recommendations latency, and the /movies and /shows
+# pages end to end through the Flask test client. SerpAPI is replaced by a
+# local stub with configurable latency and failures, so runs cost no API
+# credits and are comparable across builds.
+#   python bench.py --out bench.json                    # JSON report
+#   python bench.py --serp-latency 0.3 --serp-failures 0.1
+#   python bench.py --baseline bench.json               # exit 1 on regressions
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MODULES = {'movies': 'Movie_Recommendations', 'shows': 'Shows_Recommendations'}
+
+# Runs in a fresh interpreter: import time and peak RSS of one module
+_STARTUP_PROBE = """
+import sys, json, time, resource
+def rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+baseline = rss_mb()
+started = time.perf_counter()
+module = __import__(sys.argv[1])
+seconds = time.perf_counter() - started
+print(json.dumps({'seconds': round(seconds, 3), 'peak_rss_mb': round(rss_mb(), 1),
+                  'baseline_rss_mb': round(baseline, 1), 'source': module.MODEL_SOURCE}))
+"""
+
+class SerpapiStub:
+    # Stand-in for serpapi.search: sleeps latency +- jitter seconds, then raises
+    # for a failure_rate share of calls or answers with a fake result page
+    def __init__(self, latency=0.05, jitter=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, params):
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.failure_rate
+            self.failures += failed
+        time.sleep(delay)
+        if failed:
+            raise RuntimeError("serpapi stub: injected failure")
+        slug = params['q'].replace(' ', '+')
+        return {
+            'images_results': [{'title': f"{params['q']} poster", 'original': f"https://img.example/{slug}.jpg"}],
+            'available_on': [{'link': f"https://watch.example/{slug}", 'thumbnail': f"https://img.example/{slug}-logo.png"}],
+        }
+
+    def install(self):
+        import serpapi
+        serpapi.search = self
+        return self
+
+def percentiles(samples_ms):
+    p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+    return {'n': len(samples_ms), 'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3),
+            'p99_ms': round(float(p99), 3), 'max_ms': round(float(max(samples_ms)), 3)}
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - started) * 1e3
+
+def sample_titles(module, n, seed):
+    titles = module.indices.index.dropna().unique().tolist()
+    return random.Random(seed).sample(titles, min(n, len(titles)))
+
+def bench_startup(names, repeat):
+    # Each import runs in its own interpreter so nothing is already loaded
+    results = {}
+    for name in names:
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, '-c', _STARTUP_PROBE, MODULES[name]], cwd=SCRIPT_DIR,
+                                 capture_output=True, text=True, check=True)
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        results[name] = {
+            'seconds': min(r['seconds'] for r in runs),
+            'peak_rss_mb': max(r['peak_rss_mb'] for r in runs),
+            'baseline_rss_mb': runs[0]['baseline_rss_mb'],
+            'source': runs[0]['source'],
+            'runs': [r['seconds'] for r in runs],
+        }
+    return results
+
+def bench_latency(names, queries, seed):
+    # get_recommendations over random catalog titles, first with the result
+    # cache emptied before every call, then again with it warm
+    results = {}
+    for name in names:
+        module = __import__(MODULES[name])
+        titles = sample_titles(module, queries, seed)
+        for mode in module.MODES:
+            uncached = []
+            for title in titles:
+                module.recommend_index.cache_clear()
+                uncached.append(timed(module.get_recommendations, title, mode)[1])
+            cached = [timed(module.get_recommendations, title, mode)[1] for title in titles]
+            results[f"{name}/{mode}"] = {'uncached': percentiles(uncached), 'cached': percentiles(cached)}
+        module.recommend_index.cache_clear()
+    return results
+
+def bench_routes(names, pages, seed, stub):
+    # POST /movies and /shows through the Flask test client. The poster cache is
+    # emptied before every page, so each one pays for its SerpAPI lookups.
+    import app as webapp
+    import poster_fetch
+    client = webapp.app.test_client()
+    fields = {'movies': 'movie_name', 'shows': 'show_name'}
+    results = {}
+    for name in names:
+        titles = sample_titles(__import__(MODULES[name]), pages, seed)
+        samples, stream_samples, statuses = [], [], {}
+        calls = stub.calls
+        for title in titles:
+            poster_fetch.cache.clear()
+            response, ms = timed(lambda: client.post(f'/{name}', data={fields[name]: title}))
+            samples.append(ms)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if webapp.STREAM_POSTERS and response.status_code == 200:
+                poster_fetch.cache.clear()
+                stream = client.get(f'/stream/{name}', query_string={fields[name]: title})
+                stream_samples.append(timed(stream.get_data)[1])
+        results[name] = {'page': percentiles(samples), 'status': {str(k): v for k, v in statuses.items()},
+                         'serpapi_calls': stub.calls - calls}
+        if stream_samples:
+            results[name]['stream'] = percentiles(stream_samples)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(report, baseline, tolerance):
+    # Timing and memory figures more than `tolerance` worse than the baseline
+    regressions = []
+    def walk(new, old, path):
+        for key, value in new.items():
+            if key not in old:
+                continue
+            if isinstance(value, dict) and isinstance(old[key], dict):
+                walk(value, old[key], path + [key])
+            elif (key.endswith(('_ms', '_mb')) or key == 'seconds') and key != 'max_ms':
+                if isinstance(value, (int, float)) and old[key] and value > old[key] * (1 + tolerance):
+                    regressions.append(f"{'.'.join(path + [key])}: {old[key]} -> {value}")
+    for section in ('startup', 'latency', 'routes'):
+        walk(report.get(section, {}), baseline.get(section, {}), [section])
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Startup, memory and latency benchmark with a SerpAPI stub')
+    parser.add_argument('--engines', nargs='+', choices=list(MODULES), default=list(MODULES))
+    parser.add_argument('--skip', nargs='+', choices=['startup', 'latency', 'routes'], default=[])
+    parser.add_argument('--startup-repeat', type=int, default=3)
+    parser.add_argument('--queries', type=int, default=200, help='titles for the get_recommendations latency run')
+    parser.add_argument('--pages', type=int, default=30, help='titles for the page (route) run')
+    parser.add_argument('--serp-latency', type=float, default=0.05, help='stub seconds per SerpAPI call')
+    parser.add_argument('--serp-jitter', type=float, default=0.02)
+    parser.add_argument('--serp-failures', type=float, default=0.0, help='share of stub calls that raise')
+    parser.add_argument('--stream', action='store_true', help='bench the streamed pages (ULTRON_STREAM_POSTERS=1)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='write the JSON report here (default: stdout)')
+    parser.add_argument('--baseline', help='earlier report; exit 1 if anything got slower or bigger')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown vs the baseline')
+    args = parser.parse_args()
+
+    # Before anything imports poster_cache/app: an in-memory poster cache and
+    # the page mode under test
+    os.environ['ULTRON_POSTER_CACHE'] = ''
+    os.environ['ULTRON_STREAM_POSTERS'] = '1' if args.stream else '0'
+    os.environ.setdefault('ULTRON_WARMUP', '')
+    stub = SerpapiStub(args.serp_latency, args.serp_jitter, args.serp_failures, args.seed).install()
+
+    report = {'meta': {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'args': vars(args),
+    }}
+    if 'startup' not in args.skip:
+        report['startup'] = bench_startup(args.engines, args.startup_repeat)
+    if 'latency' not in args.skip:
+        report['latency'] = bench_latency(args.engines, args.queries, args.seed)
+    if 'routes' not in args.skip:
+        report['routes'] = bench_routes(args.engines, args.pages, args.seed, stub)
+    report['meta']['serpapi'] = {'calls': stub.calls, 'failures': stub.failures}
+
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"regression: {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import sys
+import time
+import argparse
+import numpy as np
+from neighbors import query_topk
+from ann import N_COMPONENTS, IVFIndex, lsa_embeddings
+
+# Recall@k of the ANN backend against the exact TF-IDF cosine, with query
+# latency and index memory, for a grid of probe/refine settings.
+#   python bench_ann.py                      # shows catalog, default grid
+#   python bench_ann.py --probe 4 8 16 --refine 0 4 --queries 500
+
+def recall(approx, exact):
+    return np.mean([len(set(a) & set(e)) / len(e) for a, e in zip(approx.tolist(), exact.tolist())])
+
+def main():
+    parser = argparse.ArgumentParser(description='ANN recall / latency / memory benchmark')
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--dims', type=int, default=N_COMPONENTS)
+    parser.add_argument('--lists', type=int, default=0, help='inverted lists (0 = about sqrt(rows))')
+    parser.add_argument('--probe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--refine', type=int, nargs='+', default=[0, 4, 16], help='0 = LSA scores only')
+    args = parser.parse_args()
+
+    # Only the TF-IDF matrix is used (memory-mapped from artifacts/ when built)
+    import Shows_Recommendations
+    matrix = Shows_Recommendations.tfidf_matrix
+    n = matrix.shape[0]
+    rows = np.random.default_rng(0).choice(n, min(args.queries, n), replace=False)
+
+    started = time.perf_counter()
+    exact_ids, _ = query_topk(matrix, rows, args.k)
+    exact_ms = (time.perf_counter() - started) * 1e3 / len(rows)
+
+    started = time.perf_counter()
+    _, embeddings = lsa_embeddings(matrix, args.dims)
+    index = IVFIndex.build(embeddings, args.lists)
+    build_s = time.perf_counter() - started
+    print(f"{n} rows, {len(index.centroids)} lists, {embeddings.shape[1]} dims, "
+          f"index {index.nbytes() / 2**20:.1f} MB (TF-IDF {(matrix.data.nbytes + matrix.indices.nbytes) / 2**20:.1f} MB), "
+          f"built in {build_s:.1f}s")
+    print(f"exact   recall 1.000  {exact_ms:8.2f} ms/query")
+    for refine in args.refine:
+        for probe in args.probe:
+            started = time.perf_counter()
+            ids, _ = index.search_rows(rows, args.k, matrix if refine else None, probe, refine)
+            ms = (time.perf_counter() - started) * 1e3 / len(rows)
+            print(f"probe {probe:3d} refine {refine}  recall {recall(ids, exact_ids):.3f}  {ms:8.2f} ms/query")
+
+if __name__ == '__main__':
+    sys.exit(main())
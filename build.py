@@ -0,0 +1,50 @@
+import os
+import time
+import argparse
+import importlib
+
+# Offline build step: fit the vectorizers, compute the top-K neighbour tables,
+# train the sentiment classifier and write them under artifacts/ so the app
+# can memory-map them on startup.
+#   python build.py            # build whatever is missing or stale
+#   python build.py shows -f   # force a rebuild of the TV model
+#   python build.py --memory   # per-column / per-array memory of the serving catalogs
+MODULES = {'movies': 'Movie_Recommendations', 'shows': 'Shows_Recommendations', 'sentiment': 'sentiment'}
+
+def build(name, force=False):
+    started = time.time()
+    module = importlib.import_module(MODULES[name])
+    if module.MODEL_SOURCE == 'artifacts' and not force:
+        print(f"{name}: up to date ({module.MODEL_VERSION})")
+        return
+    # Importing from CSV already built the full model; only rebuild when forced
+    model = module.build_model() if module.MODEL_SOURCE == 'artifacts' else module.model
+    manifest = module.save_model(model)
+    print(f"{name}: built {manifest['version']} ({manifest['info']['rows']} rows) in {time.time() - started:.1f}s")
+
+def memory(name):
+    # Serving footprint of a catalog as loaded from artifacts/
+    module = importlib.import_module(MODULES[name])
+    if not hasattr(module, 'catalog_memory'):
+        return
+    report = module.catalog_memory()
+    mb = lambda n: f"{n / 2**20:.1f} MB"
+    print(f"{name}: {report['rows']} rows, {mb(report['heap_bytes'])} heap, {mb(report['mapped_bytes'])} memory-mapped")
+    for part in ('frame', 'arrays'):
+        print(f"  {part}: " + ', '.join(f"{k} {mb(v)}" for k, v in sorted(report[part].items(), key=lambda kv: -kv[1])))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build recommender artifacts')
+    parser.add_argument('targets', nargs='*', help='movies, shows and/or sentiment (default: all)')
+    parser.add_argument('-f', '--force', action='store_true', help='rebuild even if artifacts are current')
+    parser.add_argument('--memory', action='store_true', help='report the memory of each serving catalog instead of building')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='processes for the neighbour tables')
+    args = parser.parse_args()
+    # Must be set before the recommender modules (and neighbors) are imported
+    os.environ['ULTRON_JOBS'] = str(args.jobs)
+    targets = args.targets or list(MODULES)
+    unknown = [t for t in targets if t not in MODULES]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+    for target in targets:
+        memory(target) if args.memory else build(target, args.force)
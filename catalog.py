@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import argparse
+import threading
+import pandas as pd
+import engines
+
+# Incremental catalog ingestion: new titles are vectorized with the fitted
+# (frozen) vocabularies, scored against the existing catalog and merged into
+# the neighbour tables at O(new x N) cost instead of an O(N^2) rebuild. The
+# rows are appended to the dataset CSVs too, so a later full rebuild keeps them.
+#   python catalog.py movies new_movies.json    # JSON list or one object per line
+# Served as POST /api/catalog when ULTRON_INGEST_TOKEN is set.
+MAX_ITEMS = 1000
+# Called as hook(kind, rows) after every ingest (serve.py uses it to have the
+# loader re-fork its workers onto the new artifacts)
+AFTER_INGEST = []
+_locks = {name: threading.Lock() for name in engines.CATALOG_NAMES}
+
+def read_items(path):
+    with open(path) as f:
+        text = f.read().strip()
+    if text.startswith('['):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+# Optional item fields by type; a missing or null field takes its default
+LIST_FIELDS = ('genres', 'keywords', 'cast')
+TEXT_FIELDS = ('overview', 'director')
+NUMBER_FIELDS = ('vote_count', 'vote_average', 'popularity')
+
+def validate(items):
+    # Raises ValueError unless items is a non-empty list of {"title": ...} objects
+    # whose optional fields have the right types; checked before anything is written
+    if not isinstance(items, list) or not items:
+        raise ValueError("items must be a non-empty list")
+    if len(items) > MAX_ITEMS:
+        raise ValueError(f"at most {MAX_ITEMS} items per request")
+    for i, item in enumerate(items):
+        if not isinstance(item, dict) or not isinstance(item.get('title'), str) or not item['title'].strip():
+            raise ValueError("every item needs a non-empty 'title'")
+        for field in LIST_FIELDS:
+            value = item.get(field)
+            if value is not None and (not isinstance(value, list) or not all(isinstance(v, str) for v in value)):
+                raise ValueError(f"item {i}: '{field}' must be a list of strings")
+        for field in TEXT_FIELDS:
+            if item.get(field) is not None and not isinstance(item[field], str):
+                raise ValueError(f"item {i}: '{field}' must be a string")
+        for field in NUMBER_FIELDS:
+            value = item.get(field)
+            if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float))):
+                raise ValueError(f"item {i}: '{field}' must be a number")
+    return items
+
+def next_id(path, column, default):
+    # First unused id of a dataset CSV (default when the CSV is not deployed)
+    if not os.path.exists(path):
+        return default
+    ids = pd.read_csv(path, usecols=[column])[column]
+    return int(ids.max()) + 1 if len(ids) else default
+
+def append_rows(path, rows):
+    # Append rows to a dataset CSV in its own column order; other columns stay empty
+    if not os.path.exists(path):
+        return False
+    columns = pd.read_csv(path, nrows=0).columns
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+    pd.DataFrame(rows).reindex(columns=columns).to_csv(path, mode='a', header=False, index=False)
+    return True
+
+def ingest(kind, items):
+    # Add items to the `kind` catalog and reload its engine; returns the new rows
+    engine = engines.ENGINES[kind]
+    validate(items)
+    with _locks[kind]:
+        rows = engine.ingest(items)
+        engine.reload()
+    for hook in AFTER_INGEST:
+        hook(kind, rows)
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Append titles to a recommender catalog')
+    parser.add_argument('kind', choices=engines.CATALOG_NAMES)
+    parser.add_argument('path', help='JSON list or JSON lines of {"title", "overview", "genres", ...}')
+    args = parser.parse_args()
+    try:
+        rows = ingest(args.kind, read_items(args.path))
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    module = engines.ENGINES[args.kind]
+    print(f"{args.kind}: added {len(rows)} titles (rows {rows[0]}-{rows[-1]}), model {module.MODEL_VERSION}")
@@ -0,0 +1,37 @@
+import os
+import re
+import numpy as np
+
+# IMDB-style "top rated" charts, computed once per model load:
+#   weighted rating = (v / (v + m)) * R + (m / (v + m)) * C
+# where v is the vote count, R the vote average, C the catalog mean and m the
+# vote count a title needs to make the chart (90th percentile by default).
+CHART_SIZE = int(os.environ.get('ULTRON_CHART_SIZE', 50))
+VOTE_QUANTILE = 0.9
+_NON_ALNUM = re.compile(r'[\W_]+')
+
+def weighted_rating(vote_count, vote_average, m, C):
+    # Works on scalars, NumPy arrays and pandas columns alike
+    return (vote_count / (vote_count + m)) * vote_average + (m / (vote_count + m)) * C
+
+def genre_key(genre):
+    # "Science Fiction", "sciencefiction" and "science-fiction" share a chart
+    return _NON_ALNUM.sub('', str(genre).lower())
+
+def top_charts(scores, qualified, genre_lists, size=CHART_SIZE):
+    # {'': best rows overall, genre_key: best rows of that genre}, each a list of
+    # at most `size` row ids sorted by score (ties: lower row first).
+    # Also returns {genre_key: display name} for the genres that have a chart.
+    order = np.lexsort((np.arange(len(scores)), -scores))
+    order = order[np.asarray(qualified)[order]]
+    charts, names = {'': order[:size].tolist()}, {}
+    for row in order.tolist():
+        for genre in genre_lists[row]:
+            key = genre_key(genre)
+            if not key:
+                continue
+            chart = charts.setdefault(key, [])
+            names.setdefault(key, genre)
+            if len(chart) < size:
+                chart.append(row)
+    return charts, names
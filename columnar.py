@@ -0,0 +1,148 @@
+import os
+import sys
+import json
+import time
+import argparse
+from ast import literal_eval
+import numpy as np
+import pandas as pd
+import artifacts
+
+# Typed binary columnar copies of the dataset CSVs (datasets/<name>.npz), for
+# model builds and CSV-fallback startups. Converted once; afterwards no CSV is
+# parsed and no literal_eval runs:
+#   numbers        -> typed arrays
+#   strings        -> one UTF-8 buffer + offsets
+#   lists of names -> flattened strings + per-row offsets (JSON columns parsed,
+#                     director already extracted from crew)
+# Each file records the fingerprint (artifacts.source_stamp) of the CSVs it
+# came from; when they change (e.g. catalog ingestion appended rows) the
+# modules go back to the CSVs until the next conversion.
+#   python columnar.py              # convert movies and shows
+#   python columnar.py shows
+DATASETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'datasets')
+FORMAT_VERSION = 2
+MOVIE_SOURCES = [os.path.join(DATASETS_DIR, 'tmdb_5000_credits.csv'), os.path.join(DATASETS_DIR, 'tmdb_5000_movies.csv')]
+SHOW_SOURCES = [os.path.join(DATASETS_DIR, 'TMDB_tv_dataset_v3.csv')]
+MOVIES_PATH = os.path.join(DATASETS_DIR, 'movies.npz')
+SHOWS_PATH = os.path.join(DATASETS_DIR, 'shows.npz')
+
+def _encode_strings(values):
+    encoded = [str(v).encode('utf-8') for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def _decode_strings(buffer, offsets):
+    data = buffer.tobytes()
+    bounds = offsets.tolist()
+    return [data[a:b].decode('utf-8') for a, b in zip(bounds[:-1], bounds[1:])]
+
+def write(path, columns, sources):
+    # columns: {name: numeric array | list of str | list of lists of str}
+    arrays, kinds = {}, {}
+    for name, values in columns.items():
+        if isinstance(values, np.ndarray) and values.dtype != object:
+            arrays[name], kinds[name] = values, 'number'
+        elif len(values) and isinstance(next(iter(values)), list):
+            lengths = np.array([len(v) for v in values], dtype=np.int64)
+            arrays[f"{name}.rows"] = np.concatenate([[0], np.cumsum(lengths)])
+            arrays[f"{name}.utf8"], arrays[f"{name}.offsets"] = _encode_strings(s for v in values for s in v)
+            kinds[name] = 'list'
+        else:
+            arrays[f"{name}.utf8"], arrays[f"{name}.offsets"] = _encode_strings(values)
+            kinds[name] = 'str'
+    meta = {'format': FORMAT_VERSION, 'sources': artifacts.source_stamp(sources), 'columns': kinds}
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+    tmp = f"{path}.tmp-{os.getpid()}.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+def read(path, sources, columns=None):
+    # DataFrame of the requested columns (all by default), or None when the
+    # file is missing, from another format version or stale for `sources`
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        meta = json.loads(data['meta'].tobytes())
+        if meta.get('format') != FORMAT_VERSION or meta['sources'] != artifacts.source_stamp(sources):
+            return None
+        frame = {}
+        for name in columns or meta['columns']:
+            kind = meta['columns'][name]
+            if kind == 'number':
+                frame[name] = data[name]
+            elif kind == 'str':
+                frame[name] = _decode_strings(data[f"{name}.utf8"], data[f"{name}.offsets"])
+            else:
+                flat = _decode_strings(data[f"{name}.utf8"], data[f"{name}.offsets"])
+                rows = data[f"{name}.rows"].tolist()
+                frame[name] = [flat[a:b] for a, b in zip(rows[:-1], rows[1:])]
+    return pd.DataFrame(frame)
+
+def split_genres(genres):
+    # TV genres: "Drama, Crime" -> ['Drama', 'Crime']
+    return [g.strip() for g in genres.split(',') if g.strip()] if isinstance(genres, str) else []
+
+def _names(value):
+    # JSON-in-string list of {"name": ...} objects -> list of names
+    parsed = literal_eval(value) if isinstance(value, str) else value
+    return [item['name'] for item in parsed] if isinstance(parsed, list) else []
+
+def _director(value):
+    parsed = literal_eval(value) if isinstance(value, str) else value
+    for item in parsed if isinstance(parsed, list) else []:
+        if item['job'] == 'Director':
+            return item['name']
+    return ''
+
+def _text(column):
+    return column.fillna('').astype(str).tolist()
+
+def convert_movies():
+    credits = pd.read_csv(MOVIE_SOURCES[0])
+    df2 = pd.read_csv(MOVIE_SOURCES[1])
+    # Same merge, and so the same row order, as the CSV build
+    credits.columns = ['id', 'title_x', 'cast', 'crew']
+    df2 = df2.merge(credits, on='id')
+    write(MOVIES_PATH, {
+        'id': df2['id'].to_numpy(np.int64),
+        'title': _text(df2['title']),
+        'overview': _text(df2['overview']),
+        'genres': df2['genres'].map(_names).tolist(),
+        'keywords': df2['keywords'].map(_names).tolist(),
+        'cast': df2['cast'].map(_names).tolist(),
+        'director': df2['crew'].map(_director).tolist(),
+        'vote_count': df2['vote_count'].to_numpy(np.float64),
+        'vote_average': df2['vote_average'].to_numpy(np.float64),
+        'popularity': df2['popularity'].to_numpy(np.float64),
+    }, MOVIE_SOURCES)
+    return MOVIES_PATH, len(df2)
+
+def convert_shows():
+    df2 = pd.read_csv(SHOW_SOURCES[0], usecols=['id', 'name', 'overview', 'genres', 'vote_count', 'vote_average', 'popularity'])
+    write(SHOWS_PATH, {
+        'id': df2['id'].to_numpy(np.int64),
+        'name': _text(df2['name']),
+        'overview': _text(df2['overview']),
+        'genres': df2['genres'].map(split_genres).tolist(),
+        'vote_count': df2['vote_count'].to_numpy(np.float64),
+        'vote_average': df2['vote_average'].to_numpy(np.float64),
+        'popularity': df2['popularity'].to_numpy(np.float64),
+    }, SHOW_SOURCES)
+    return SHOWS_PATH, len(df2)
+
+CONVERTERS = {'movies': convert_movies, 'shows': convert_shows}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert the dataset CSVs to binary columnar .npz files')
+    parser.add_argument('targets', nargs='*', help='movies and/or shows (default: both)')
+    args = parser.parse_args()
+    unknown = [t for t in args.targets if t not in CONVERTERS]
+    if unknown:
+        parser.error(f"unknown target(s): {', '.join(unknown)}")
+    for target in args.targets or list(CONVERTERS):
+        started = time.time()
+        path, rows = CONVERTERS[target]()
+        print(f"{target}: {rows} rows -> {os.path.relpath(path)} "
+              f"({os.path.getsize(path) / 2**20:.1f} MB) in {time.time() - started:.1f}s", file=sys.stderr)
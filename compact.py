@@ -0,0 +1,54 @@
+import sys
+import numpy as np
+import pandas as pd
+
+# Serving catalogs keep only what the routes read: interned titles and float32
+# vote/popularity columns. Genres live in the per-title uint32 bitmask
+# (genres.bitmasks), and overview, cast, crew, keywords and soup text are
+# dropped as soon as the vectorizers and neighbour tables are built.
+NUMERIC_COLUMNS = ('vote_count', 'vote_average', 'popularity')
+
+def catalog_frame(title_column, titles, numeric):
+    # numeric: {column: values} for NUMERIC_COLUMNS
+    titles = [sys.intern(t) if isinstance(t, str) else '' for t in titles]
+    frame = pd.DataFrame({title_column: pd.Series(titles, dtype=object)})
+    for column in NUMERIC_COLUMNS:
+        frame[column] = np.asarray(numeric[column], dtype=np.float32)
+    return frame
+
+def genre_lists(genre_names, genre_mask):
+    # Bitmasks back to lists of genre names (charts, ingestion); not kept around
+    bits = [(np.uint32(1 << i), name) for i, name in enumerate(genre_names)]
+    return [[name for bit, name in bits if mask & bit] for mask in np.asarray(genre_mask, dtype=np.uint32)]
+
+def nbytes(value):
+    # Bytes behind an array, a CSR matrix or a dict of arrays
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values())
+    if hasattr(value, 'indptr'):
+        return value.data.nbytes + value.indices.nbytes + value.indptr.nbytes
+    return int(np.asarray(value).nbytes)
+
+def memory_report(frame, arrays):
+    # {'frame': {column: bytes}, 'arrays': {name: bytes}, 'mapped_bytes', 'heap_bytes'}
+    # Memory-mapped arrays live in the page cache (shared between processes);
+    # everything else is this process' heap.
+    columns = {str(k): int(v) for k, v in frame.memory_usage(index=True, deep=True).items()}
+    sizes = {name: nbytes(value) for name, value in arrays.items()}
+    mapped = sum(size for name, size in sizes.items() if _is_mapped(arrays[name]))
+    return {
+        'rows': len(frame),
+        'frame': columns,
+        'arrays': sizes,
+        'mapped_bytes': mapped,
+        'heap_bytes': sum(columns.values()) + sum(sizes.values()) - mapped,
+    }
+
+def _is_mapped(value):
+    if hasattr(value, 'indptr'):
+        value = value.data
+    while isinstance(value, np.ndarray):
+        if isinstance(value, np.memmap):
+            return True
+        value = value.base
+    return False
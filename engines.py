@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import threading
+import importlib
+import metrics
+
+# The recommender modules load (or build) their models at import time, so the
+# web app only imports them when a request first needs one. Static pages never
+# wait on a model, and a movie query never pays for the TV catalog.
+#   ULTRON_WARMUP=all (or e.g. "movies,sentiment") loads engines in a background
+#   thread as soon as the app starts, instead of on the first request.
+WARMUP = os.environ.get('ULTRON_WARMUP', '')
+
+class Engine:
+    def __init__(self, name, module_name):
+        self.name = name
+        self.module_name = module_name
+        self.module = None
+        self.error = None
+        self.load_seconds = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self.module is not None
+
+    def load(self):
+        # Import the recommender module once; concurrent callers wait for the
+        # first one. A failed load is recorded and retried on the next call.
+        if self.module is not None:
+            return self.module
+        with self._lock:
+            if self.module is None:
+                started = time.perf_counter()
+                try:
+                    with metrics.span(f'{self.name}.load'):
+                        module = importlib.import_module(self.module_name)
+                except Exception as e:
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self.error = None
+                self.module = module
+        return self.module
+
+    def reload(self):
+        # Re-run the module against the current artifacts (after an ingest).
+        # The new model is imported as a fresh module object and swapped in with
+        # one assignment; requests still holding the old module (see load())
+        # keep reading its complete, unchanged state instead of a half-rebuilt one.
+        with self._lock:
+            old = sys.modules.pop(self.module_name, None)
+            try:
+                module = importlib.import_module(self.module_name)
+            except Exception:
+                if old is not None:
+                    sys.modules[self.module_name] = old
+                raise
+            self.module = module
+        return self.module
+
+    def __getattr__(self, attr):
+        # engines.movies.get_recommendations(...) loads the model on first use.
+        # A request that reads several attributes should take one module with
+        # load() first, so a concurrent reload cannot mix two models.
+        return getattr(self.load(), attr)
+
+    def status(self):
+        info = {'loaded': self.loaded, 'seconds': self.load_seconds, 'error': self.error}
+        if self.loaded:
+            info['source'] = self.module.MODEL_SOURCE
+            info['version'] = self.module.MODEL_VERSION
+        return info
+
+ENGINES = {
+    'movies': Engine('movies', 'Movie_Recommendations'),
+    'shows': Engine('shows', 'Shows_Recommendations'),
+    'sentiment': Engine('sentiment', 'sentiment'),
+}
+# Engines that are title catalogs (suggest, recommend, charts, ingestion)
+CATALOG_NAMES = ('movies', 'shows')
+movies = ENGINES['movies']
+shows = ENGINES['shows']
+sentiment = ENGINES['sentiment']
+
+# Engines the warmup thread was asked to load, and the thread itself
+_warmup = {'names': [], 'thread': None}
+
+def _warm(names):
+    for name in names:
+        try:
+            ENGINES[name].load()
+        except Exception:
+            pass  # recorded on the engine and reported by health()
+
+def start_warmup(spec=WARMUP):
+    # spec: "all", or a comma-separated list of engine names; "" disables warmup
+    if _warmup['thread'] is not None or not spec:
+        return _warmup['thread']
+    names = list(ENGINES) if spec.strip().lower() in ('1', 'all', 'true') else \
+        [n.strip() for n in spec.split(',') if n.strip() in ENGINES]
+    if not names:
+        return None
+    thread = threading.Thread(target=_warm, args=(names,), name='engine-warmup', daemon=True)
+    _warmup.update(names=names, thread=thread)
+    thread.start()
+    return thread
+
+@metrics.collector
+def engine_metrics():
+    # Load state of every engine and result cache stats of the loaded catalogs
+    samples = []
+    for name, engine in ENGINES.items():
+        samples.append(('ultron_engine_loaded', 'gauge', 'Whether the engine model is loaded', {'engine': name}, int(engine.loaded)))
+        if engine.load_seconds is not None:
+            samples.append(('ultron_engine_load_seconds', 'gauge', 'Time the engine took to load', {'engine': name}, engine.load_seconds))
+        if engine.loaded and hasattr(engine.module, 'result_cache_info'):
+            info = engine.module.result_cache_info()
+            samples += [
+                ('ultron_result_cache_hits_total', 'counter', 'Recommendation result cache hits', {'engine': name}, info.hits),
+                ('ultron_result_cache_misses_total', 'counter', 'Recommendation result cache misses', {'engine': name}, info.misses),
+                ('ultron_result_cache_entries', 'gauge', 'Entries in the recommendation result cache', {'engine': name}, info.currsize),
+            ]
+        if engine.loaded and hasattr(engine.module, 'catalog_memory'):
+            report = engine.module.catalog_memory()
+            samples += [('ultron_catalog_bytes', 'gauge', 'Serving catalog memory (heap, or mapped from artifacts/)',
+                         {'engine': name, 'kind': kind}, report[f'{kind}_bytes']) for kind in ('heap', 'mapped')]
+    return samples
+
+def health():
+    # Ready once every engine the warmup was asked for has loaded. Engines that
+    # are not warmed load lazily and do not hold readiness back.
+    engines = {name: engine.status() for name, engine in ENGINES.items()}
+    warming = [n for n in _warmup['names'] if not ENGINES[n].loaded]
+    failed = [n for n, info in engines.items() if info['error']]
+    return {'ready': not warming and not failed, 'warming': warming, 'engines': engines}
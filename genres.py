@@ -0,0 +1,79 @@
+import numpy as np
+from charts import genre_key
+
+# Genres are encoded once per title as a bitmask (bit i = genre_names[i]) so
+# set operations on whole candidate blocks become NumPy bitwise ops.
+MAX_GENRES = 32
+
+# Number of set bits for every byte value, used to popcount uint32 arrays
+_BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def bitmasks(genre_lists, genre_names=None):
+    # genre_lists: iterable of lists of genre names -> (genre_names, uint32 masks)
+    genre_lists = list(genre_lists)
+    if genre_names is None:
+        genre_names = sorted({g for genres in genre_lists for g in genres})
+    if len(genre_names) > MAX_GENRES:
+        raise ValueError(f"{len(genre_names)} genres do not fit in a uint32 bitmask")
+    bit = {g: 1 << i for i, g in enumerate(genre_names)}
+    masks = np.fromiter((sum(bit[g] for g in set(genres) if g in bit) for genres in genre_lists),
+                        dtype=np.uint32, count=len(genre_lists))
+    return list(genre_names), masks
+
+def group_mask(genre_names, group):
+    # Mask of every known genre in `group`; names absent from the catalog are ignored
+    mask = 0
+    for i, g in enumerate(genre_names):
+        if g in group:
+            mask |= 1 << i
+    return np.uint32(mask)
+
+def popcount(masks):
+    masks = np.ascontiguousarray(masks, dtype=np.uint32)
+    return _BYTE_BITS[masks.view(np.uint8)].reshape(masks.shape + (4,)).sum(axis=-1, dtype=np.int32)
+
+def query_mask(genre_names, genre):
+    # Bits a user-facing genre name selects: "science fiction" -> sciencefiction,
+    # "fantasy" -> "Sci-Fi & Fantasy" as well as a plain "Fantasy" genre
+    key = genre_key(genre)
+    mask = 0
+    for i, name in enumerate(genre_names):
+        if key and (genre_key(name) == key or key in (genre_key(part) for part in str(name).split('&'))):
+            mask |= 1 << i
+    return np.uint32(mask)
+
+class GenreMixer:
+    # Titles carrying every requested genre (and none of the excluded ones), in
+    # a precomputed ranking. Masks are stored in ranking order, so a query is a
+    # few vectorized bitwise ops over the catalog and the first rows are the best.
+    def __init__(self, genre_names, genre_mask, rankings):
+        # rankings: {name: score per row}, higher is better
+        self.genre_names = list(genre_names)
+        self.orders, self.ordered_masks = {}, {}
+        for name, scores in rankings.items():
+            scores = np.asarray(scores, dtype=np.float64)
+            order = np.lexsort((np.arange(len(scores)), -scores)).astype(np.int32)
+            self.orders[name] = order
+            self.ordered_masks[name] = np.asarray(genre_mask)[order]
+
+    def _mask(self, genre):
+        mask = query_mask(self.genre_names, genre)
+        if not mask:
+            raise ValueError(f"Unknown genre '{genre}'. Known genres: {', '.join(self.genre_names)}.")
+        return mask
+
+    def rows(self, include, exclude=(), rank='rating', limit=20):
+        if rank not in self.orders:
+            raise ValueError(f"rank must be one of: {', '.join(self.orders)}.")
+        if not include:
+            raise ValueError("At least one genre is required.")
+        masks = self.ordered_masks[rank]
+        keep = np.ones(len(masks), dtype=bool)
+        for genre in include:
+            keep &= (masks & self._mask(genre)) != 0
+        excluded = np.uint32(0)
+        for genre in exclude:
+            excluded |= self._mask(genre)
+        if excluded:
+            keep &= (masks & excluded) == 0
+        return self.orders[rank][np.flatnonzero(keep)[:limit]].tolist()
@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS gauge
+    resource = None
+
+# In-process metrics for the web app, served in the Prometheus text format on
+# GET /metrics. Spans time the stages of a request (title lookup, ranking, the
+# genre filter, poster fetches, each SerpAPI call) into one histogram; values
+# that already live elsewhere (cache stats, memory) are read by collectors at
+# scrape time so the hot path never pays for them.
+#   ULTRON_SERVER_TIMING=1 also reports the spans of each request in a
+#   Server-Timing response header (visible in the browser dev tools).
+SERVER_TIMING = os.environ.get('ULTRON_SERVER_TIMING', '0') == '1'
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'ultron_span_seconds': ('histogram', 'Time spent in each instrumented stage'),
+    'ultron_request_seconds': ('histogram', 'HTTP request latency by endpoint'),
+    'ultron_requests_total': ('counter', 'HTTP requests by endpoint and status'),
+    'ultron_external_seconds': ('histogram', 'Latency of calls to external services'),
+    'ultron_external_calls_total': ('counter', 'Calls to external services by outcome'),
+    'ultron_external_inflight': ('gauge', 'External calls currently in flight'),
+}
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> value
+_gauges = {}       # (name, labels) -> value
+_histograms = {}   # (name, labels) -> [bucket counts..., sum, count]
+_collectors = []
+_request = threading.local()
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def add(name, value, **labels):
+    # Move a gauge up or down
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = _gauges.get(key, 0) + value
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry[i] += 1
+        entry[-2] += seconds
+        entry[-1] += 1
+
+@contextmanager
+def span(name):
+    # Time a stage; also listed in the Server-Timing header of the current request
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe('ultron_span_seconds', elapsed, span=name)
+        spans = getattr(_request, 'spans', None)
+        if spans is not None:
+            spans.append((name, elapsed))
+
+@contextmanager
+def external(service):
+    # An outbound call: in-flight gauge, latency histogram and outcome counter
+    add('ultron_external_inflight', 1, service=service)
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        add('ultron_external_inflight', -1, service=service)
+        observe('ultron_external_seconds', time.perf_counter() - started, service=service)
+        inc('ultron_external_calls_total', service=service, outcome=outcome)
+
+def collector(fn):
+    # fn() -> [(name, type, help, labels, value), ...], called on every scrape
+    _collectors.append(fn)
+    return fn
+
+def start_request():
+    _request.spans = []
+    _request.started = time.perf_counter()
+
+def end_request(endpoint, status):
+    # Record the request and return its Server-Timing header value (or None)
+    spans = getattr(_request, 'spans', None)
+    if spans is None:
+        return None
+    elapsed = time.perf_counter() - _request.started
+    _request.spans = None
+    observe('ultron_request_seconds', elapsed, endpoint=endpoint)
+    inc('ultron_requests_total', endpoint=endpoint, status=str(status))
+    if not SERVER_TIMING:
+        return None
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    timings = [f"{name};dur={seconds * 1e3:.2f}" for name, seconds in totals.items()]
+    return ', '.join(timings + [f"total;dur={elapsed * 1e3:.2f}"])
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render():
+    # Prometheus text exposition format (version 0.0.4)
+    with _lock:
+        counters, gauges = dict(_counters), dict(_gauges)
+        histograms = {key: list(entry) for key, entry in _histograms.items()}
+    families = {}
+    for (name, labels), value in counters.items():
+        families.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(value)}")
+    for (name, labels), value in gauges.items():
+        families.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(value)}")
+    for (name, labels), entry in histograms.items():
+        lines = families.setdefault(name, [])
+        for bound, count in zip(BUCKETS, entry):
+            lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {count}")
+        lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {entry[-1]}")
+        lines.append(f"{name}_sum{_labels(labels)} {_number(entry[-2])}")
+        lines.append(f"{name}_count{_labels(labels)} {entry[-1]}")
+    for fn in _collectors:
+        try:
+            samples = fn()
+        except Exception:
+            continue  # a broken collector must not take /metrics down
+        for name, kind, help_text, labels, value in samples:
+            HELP.setdefault(name, (kind, help_text))
+            families.setdefault(name, []).append(f"{name}{_labels(sorted(labels.items()))} {_number(value)}")
+    out = []
+    for name in sorted(families):
+        kind, help_text = HELP.get(name, ('untyped', name))
+        out += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"] + families[name]
+    return '\n'.join(out) + '\n'
+
+@collector
+def memory():
+    # Resident set size now (Linux /proc) and the peak so far
+    samples = []
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak if sys.platform == 'darwin' else peak * 1024
+        samples.append(('ultron_peak_rss_bytes', 'gauge', 'Peak resident memory of this process', {}, peak))
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        samples.append(('ultron_rss_bytes', 'gauge', 'Resident memory of this process', {}, rss))
+    except (OSError, ValueError, IndexError):
+        pass
+    # Proportional (Pss) and private memory: what this process adds on top of
+    # the pages it shares with the other serve.py workers
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = {line.split()[0].rstrip(':'): int(line.split()[1]) * 1024 for line in f if line.endswith('kB\n')}
+        samples.append(('ultron_pss_bytes', 'gauge', 'Proportional set size (shared pages split between processes)', {}, fields['Pss']))
+        samples.append(('ultron_private_bytes', 'gauge', 'Memory not shared with any other process',
+                        {}, fields['Private_Clean'] + fields['Private_Dirty']))
+    except (OSError, ValueError, KeyError):
+        pass
+    return samples
@@ -0,0 +1,126 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+
+# Number of neighbours kept per row and rows multiplied per block.
+# Peak memory while building is roughly BLOCK_SIZE * n_rows * 4 bytes.
+TOP_K = int(os.environ.get('ULTRON_TOP_K', 64))
+BLOCK_SIZE = int(os.environ.get('ULTRON_BLOCK_SIZE', 2000))
+# Worker processes used to build neighbour tables (1 = build in-process)
+N_JOBS = int(os.environ.get('ULTRON_JOBS', 1))
+
+def block_topk(block, rows, k):
+    # block is a dense (len(rows), n) similarity slice for catalog rows `rows`.
+    # Returns the k best column ids per row (self excluded), best first.
+    block[np.arange(block.shape[0]), rows] = -np.inf
+    part = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(block, part, axis=1)
+    # Highest score first, ties broken by the lower id like a stable sort would
+    order = np.lexsort((part, -part_scores), axis=1)
+    ids = np.take_along_axis(part, order, axis=1).astype(np.int32)
+    scores = np.take_along_axis(part_scores, order, axis=1).astype(np.float32)
+    return ids, scores
+
+# Per-process state for pool workers, set once by _init_worker
+_worker = {}
+
+def _init_worker(matrix, matrix_t, k, block_size):
+    _worker.update(matrix=matrix, matrix_t=matrix_t, k=k, block_size=block_size)
+
+def _worker_block(start):
+    matrix = _worker['matrix']
+    stop = min(start + _worker['block_size'], matrix.shape[0])
+    block = (matrix[start:stop] @ _worker['matrix_t']).toarray()
+    return start, block_topk(block, np.arange(start, stop), _worker['k'])
+
+def topk_neighbors(matrix, k=TOP_K, block_size=BLOCK_SIZE, n_jobs=N_JOBS):
+    # Top-k rows of matrix @ matrix.T without ever materialising the N x N product.
+    # Rows are expected to be L2-normalised so the dot product is the cosine.
+    # Row blocks are independent, so with n_jobs > 1 they are spread over a
+    # process pool; each worker holds one dense block at a time.
+    matrix = csr_matrix(matrix, dtype=np.float32)
+    n = matrix.shape[0]
+    k = max(1, min(k, n - 1))
+    matrix_t = matrix.T.tocsr()
+    ids = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    starts = range(0, n, block_size)
+    if n_jobs > 1 and len(starts) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(matrix, matrix_t, k, block_size)) as pool:
+            for start, (block_ids, block_scores) in pool.map(_worker_block, starts):
+                stop = start + block_ids.shape[0]
+                ids[start:stop], scores[start:stop] = block_ids, block_scores
+        return ids, scores
+    for start in starts:
+        stop = min(start + block_size, n)
+        block = (matrix[start:stop] @ matrix_t).toarray()
+        ids[start:stop], scores[start:stop] = block_topk(block, np.arange(start, stop), k)
+    return ids, scores
+
+def query_topk(matrix, rows, k, block_size=BLOCK_SIZE):
+    # Top-k neighbours of arbitrary catalog rows, scored against the whole matrix
+    # in one sparse product per block of rows. matrix @ rows.T avoids transposing
+    # the (possibly memory-mapped) catalog matrix.
+    rows = np.asarray(rows, dtype=np.int64)
+    k = max(1, min(k, matrix.shape[0] - 1))
+    ids = np.empty((len(rows), k), dtype=np.int32)
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    for start in range(0, len(rows), block_size):
+        chunk = rows[start:start + block_size]
+        block = (matrix @ matrix[chunk].T).T.toarray().astype(np.float32, copy=False)
+        ids[start:start + len(chunk)], scores[start:start + len(chunk)] = block_topk(block, chunk, k)
+    return ids, scores
+
+def profile_scores(matrix, rows, weights):
+    # Cosine of every catalog row with a taste profile: the weighted sum of the
+    # seed rows (negative weights pull away from a title) becomes one dense
+    # query vector and the catalog is scored in a single matrix @ query product.
+    # That product costs O(nnz(matrix)) however many terms the query has, so
+    # 50 seeds cost about the same as one.
+    rows = np.asarray(rows, dtype=np.int64)
+    weights = csr_matrix((np.asarray(weights, dtype=np.float32), (np.zeros(len(rows), dtype=np.int64), rows)),
+                         shape=(1, matrix.shape[0]))
+    query = (weights @ matrix).toarray().ravel()
+    norm = np.linalg.norm(query)
+    scores = np.asarray(matrix @ query, dtype=np.float32)
+    return scores / norm if norm > 0 else scores
+
+def page_topk(scores, offset, limit, exclude=()):
+    # Rows offset .. offset + limit of the ranking by score (best first, ties by
+    # lower id) with argpartition: only the first offset + limit rows are sorted
+    scores = np.array(scores, dtype=np.float32)
+    scores[np.asarray(exclude, dtype=np.int64)] = -np.inf
+    end = min(offset + limit, int(np.isfinite(scores).sum()))
+    if end <= offset:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    part = np.argpartition(-scores, end - 1)[:end]
+    top = part[np.lexsort((part, -scores[part]))][offset:end]
+    return top, scores[top]
+
+def merge_topk(ids, scores, new_ids, new_scores, k):
+    # Best k of two candidate sets per row (both (rows, *) arrays), best first
+    ids = np.hstack([ids, new_ids])
+    scores = np.hstack([scores, new_scores])
+    order = np.lexsort((ids, -scores), axis=1)[:, :k]
+    return np.take_along_axis(ids, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+def extend_neighbors(ids, scores, matrix, new_matrix, block_size=BLOCK_SIZE):
+    # Neighbour tables for matrix stacked with new_matrix, without recomputing
+    # the old rows: new rows are scored against everything (O(new x N)) and old
+    # rows only change where a new row beats their current k-th neighbour.
+    # Returns (stacked matrix, ids, scores).
+    n_old, k = ids.shape
+    full = vstack([csr_matrix(matrix, dtype=np.float32), csr_matrix(new_matrix, dtype=np.float32)]).tocsr()
+    new_rows = np.arange(n_old, full.shape[0])
+    new_ids, new_scores = query_topk(full, new_rows, k, block_size)
+    ids, scores = np.array(ids), np.array(scores)
+    for start in range(0, len(new_rows), block_size):
+        chunk = new_rows[start:start + block_size]
+        block = (full[:n_old] @ full[chunk].T).toarray().astype(np.float32, copy=False)  # n_old x chunk
+        affected = np.flatnonzero(block.max(axis=1) > scores[:, -1])
+        if len(affected):
+            candidate_ids = np.broadcast_to(chunk.astype(np.int32), (len(affected), len(chunk)))
+            ids[affected], scores[affected] = merge_topk(ids[affected], scores[affected], candidate_ids, block[affected], k)
+    return full, np.vstack([ids, new_ids]), np.vstack([scores, new_scores])
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from title_index import normalize_title
+import metrics
+
+# Read-through cache for SerpAPI lookups (posters, show images, available_on
+# links, genre mixes), keyed by (kind, normalized title).
+#   tier 1: per-process LRU
+#   tier 2: SQLite file shared by every worker process on the box
+# Entries older than their TTL are still served for up to MAX_STALE seconds
+# while a background refresh fetches a new value (stale-while-revalidate).
+# "No Image Found"/"Not Available" answers are cached too, with a shorter TTL.
+CACHE_PATH = os.environ.get('ULTRON_POSTER_CACHE', os.path.join(tempfile.gettempdir(), 'ultron_posters.sqlite3'))
+LRU_SIZE = int(os.environ.get('ULTRON_POSTER_LRU', 2048))
+TTL = float(os.environ.get('ULTRON_POSTER_TTL', 7 * 24 * 3600))
+NEGATIVE_TTL = float(os.environ.get('ULTRON_POSTER_NEGATIVE_TTL', 24 * 3600))
+MAX_STALE = float(os.environ.get('ULTRON_POSTER_MAX_STALE', 30 * 24 * 3600))
+NEGATIVE_VALUES = ("No Image Found", "Not Available")
+
+# Returned by lookup() when there is nothing usable cached
+MISS = object()
+
+class PosterCache:
+    def __init__(self, path=CACHE_PATH, lru_size=LRU_SIZE, ttl=TTL, negative_ttl=NEGATIVE_TTL, max_stale=MAX_STALE):
+        # path='' keeps the cache in memory only
+        self.path = path
+        self.lru_size = lru_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_stale = max_stale
+        self.stats = {'hits': 0, 'stale': 0, 'misses': 0, 'refreshes': 0}
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='poster-refresh')
+
+    def _db(self):
+        # One connection per thread; any SQLite failure drops to LRU-only mode
+        if not self.path:
+            return None
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = sqlite3.connect(self.path, timeout=5)
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.execute('CREATE TABLE IF NOT EXISTS posters ('
+                             'kind TEXT, key TEXT, value TEXT, fetched_at REAL, PRIMARY KEY (kind, key))')
+                conn.commit()
+            except sqlite3.Error:
+                self.path = ''
+                return None
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, cache_key, entry):
+        with self._lock:
+            self._lru[cache_key] = entry
+            self._lru.move_to_end(cache_key)
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+
+    def _read(self, cache_key):
+        with self._lock:
+            entry = self._lru.get(cache_key)
+            if entry is not None:
+                self._lru.move_to_end(cache_key)
+                return entry
+        db = self._db()
+        if db is None:
+            return None
+        try:
+            row = db.execute('SELECT value, fetched_at FROM posters WHERE kind = ? AND key = ?', cache_key).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        entry = (json.loads(row[0]), row[1])
+        self._remember(cache_key, entry)
+        return entry
+
+    def _write(self, cache_key, value):
+        entry = (value, time.time())
+        self._remember(cache_key, entry)
+        db = self._db()
+        if db is not None:
+            try:
+                db.execute('INSERT OR REPLACE INTO posters VALUES (?, ?, ?, ?)', cache_key + (json.dumps(value), entry[1]))
+                db.commit()
+            except sqlite3.Error:
+                pass
+
+    def _refresh(self, cache_key, title, fetch):
+        try:
+            self._write(cache_key, fetch(title))
+            self.stats['refreshes'] += 1
+        except Exception:
+            pass  # keep serving the stale value
+        finally:
+            with self._lock:
+                self._refreshing.discard(cache_key)
+
+    def lookup(self, kind, title, fetch=None):
+        # Cached value, or MISS. Stale values are returned as-is and, if fetch is
+        # given, refreshed in the background (at most one refresh per key).
+        cache_key = (kind, normalize_title(title))
+        entry = self._read(cache_key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return MISS
+        value, fetched_at = entry
+        age = time.time() - fetched_at
+        ttl = self.negative_ttl if value in NEGATIVE_VALUES else self.ttl
+        if age < ttl:
+            self.stats['hits'] += 1
+            return value
+        if age >= ttl + self.max_stale:
+            self.stats['misses'] += 1
+            return MISS
+        self.stats['stale'] += 1
+        if fetch is not None:
+            with self._lock:
+                start = cache_key not in self._refreshing
+                self._refreshing.add(cache_key)
+            if start:
+                self._refresher.submit(self._refresh, cache_key, title, fetch)
+        return value
+
+    def store(self, kind, title, value):
+        self._write((kind, normalize_title(title)), value)
+
+    def fill(self, kind, title, fetch):
+        # fetch(title) and cache it; exceptions propagate and nothing is cached
+        value = fetch(title)
+        self.store(kind, title, value)
+        return value
+
+    def get(self, kind, title, fetch):
+        # Read-through: cached value, or a freshly fetched one stored for next time
+        value = self.lookup(kind, title, fetch)
+        if value is MISS:
+            value = self.fill(kind, title, fetch)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+        db = self._db()
+        if db is not None:
+            db.execute('DELETE FROM posters')
+            db.commit()
+
+cache = PosterCache()
+
+@metrics.collector
+def cache_metrics():
+    samples = [('ultron_poster_cache_events_total', 'counter', 'Poster cache lookups by outcome', {'event': event}, count)
+               for event, count in cache.stats.items()]
+    samples.append(('ultron_poster_cache_entries', 'gauge', 'Entries in the in-process poster LRU', {}, len(cache._lru)))
+    return samples
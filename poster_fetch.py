@@ -0,0 +1,151 @@
+import os
+import json
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError
+import serpapi
+import metrics
+from poster_cache import cache, MISS
+
+# SerpAPI lookups for recommendation pages, fanned out over a shared thread pool.
+# A page waits at most FETCH_DEADLINE seconds in total and FETCH_TIMEOUT per
+# item; anything slower gets a placeholder instead of holding up the page.
+NO_IMAGE = "No Image Found"
+NOT_AVAILABLE = "Not Available"
+# Shown until a streamed poster arrives
+LOADING_IMAGE = "https://via.placeholder.com/300x450?text=Loading"
+FETCH_WORKERS = int(os.environ.get('ULTRON_FETCH_WORKERS', 16))
+FETCH_DEADLINE = float(os.environ.get('ULTRON_FETCH_DEADLINE', 8))
+FETCH_TIMEOUT = float(os.environ.get('ULTRON_FETCH_TIMEOUT', 5))
+
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='serpapi')
+
+def fetch_all(items, fetch, placeholder, deadline=FETCH_DEADLINE, timeout=FETCH_TIMEOUT):
+    # Run fetch(item) concurrently for every item; returns {item: result} in input order
+    futures = {item: _executor.submit(fetch, item) for item in items}
+    give_up_at = time.monotonic() + deadline
+    results = {}
+    for item, future in futures.items():
+        try:
+            results[item] = future.result(timeout=max(0.0, min(timeout, give_up_at - time.monotonic())))
+        except Exception:
+            # Timed out or the lookup itself failed; an unstarted lookup is dropped
+            future.cancel()
+            results[item] = placeholder
+    return results
+
+def cached_fetch_all(kind, items, fetch, placeholder):
+    # fetch_all through the poster cache: hits are answered inline, only misses
+    # reach SerpAPI. Lookups that overrun the deadline still land in the cache.
+    results = {item: cache.lookup(kind, item, fetch) for item in items}
+    misses = [item for item, value in results.items() if value is MISS]
+    if misses:
+        results.update(fetch_all(misses, partial(cache.fill, kind, fetch=fetch), placeholder))
+    return results
+
+def movie_posters(titles, api_key):
+    return cached_fetch_all('movie_poster', titles, partial(movie_poster, api_key=api_key), NO_IMAGE)
+
+def show_images(titles, api_key):
+    return cached_fetch_all('show_image', titles, partial(first_image, api_key=api_key), NO_IMAGE)
+
+def availability(titles, api_key):
+    return cached_fetch_all('available_on', titles, partial(available_on, api_key=api_key), NOT_AVAILABLE)
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def page_events(kind, titles, api_key, available=False, deadline=FETCH_DEADLINE):
+    # Server-Sent Events for a recommendation page: the titles first, then one
+    # 'poster' (and with available=True one 'available') event per title as
+    # soon as its lookup resolves, cache hits first. Lookups still pending at
+    # the deadline get their placeholder. Ends with a 'done' event.
+    lookups = [('poster',) + POSTER_LOOKUPS[kind] + (NO_IMAGE,)]
+    if available:
+        lookups.append(('available', 'available_on', available_on, NOT_AVAILABLE))
+    hits, futures = [], {}
+    for event, cache_kind, fetch, placeholder in lookups:
+        fetch = partial(fetch, api_key=api_key)
+        for index, title in enumerate(titles):
+            value = cache.lookup(cache_kind, title, fetch)
+            if value is MISS:
+                future = _executor.submit(cache.fill, cache_kind, title, fetch)
+                futures[future] = (event, index, title, placeholder)
+            else:
+                hits.append((event, index, title, value))
+    yield sse('titles', {'titles': titles})
+    for event, index, title, value in hits:
+        yield sse(event, {'index': index, 'title': title, 'value': value})
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            event, index, title, placeholder = futures.pop(future)
+            try:
+                value = future.result()
+            except Exception:
+                value = placeholder
+            yield sse(event, {'index': index, 'title': title, 'value': value})
+    except TimeoutError:
+        for future, (event, index, title, placeholder) in futures.items():
+            future.cancel()
+            yield sse(event, {'index': index, 'title': title, 'value': placeholder})
+    yield sse('done', {})
+
+def serp_search(params):
+    # Every SerpAPI call goes through here: in-flight gauge, latency, errors
+    with metrics.external('serpapi'):
+        return serpapi.search(params)
+
+def movie_poster(title, api_key):
+    # Search specifically for movie poster to avoid book covers
+    params = {
+        "q": f"{title} movie poster",
+        "engine": "google_images",
+        "hl": 'en',
+        "ijn": "0",
+        "api_key": api_key
+    }
+    search = serp_search(params)
+    if 'images_results' in search and search['images_results']:
+        # Try to find a poster image (look through first few results)
+        image_link = None
+        for result in search['images_results'][:5]:
+            # Check if it's likely a poster (has "poster" in title or looks like a poster)
+            result_title = result.get('title', '').lower()
+            if 'poster' in result_title or 'movie' in result_title or 'film' in result_title:
+                image_link = result.get('original') or result.get('link')
+                break
+        # If no poster found, use first result
+        if not image_link:
+            image_link = search['images_results'][0].get('original') or search['images_results'][0].get('link')
+        return image_link
+    return NO_IMAGE
+
+def first_image(title, api_key):
+    params = {
+        "q": title,
+        "engine": "google_images",
+        "hl": 'en',
+        "ijn": "0",
+        "api_key": api_key
+    }
+    search = serp_search(params)
+    if 'images_results' in search and search['images_results']:
+        return search['images_results'][0]['original']
+    return NO_IMAGE
+
+def available_on(title, api_key):
+    # [(link, thumbnail), ...] of streaming providers, or NOT_AVAILABLE
+    params = {
+        "q": title,
+        "engine": "google",
+        "hl": 'en',
+        "ijn": "0",
+        "api_key": api_key
+    }
+    search = serp_search(params)
+    if 'available_on' in search:
+        return [(item['link'], item['thumbnail']) for item in search['available_on']]
+    return NOT_AVAILABLE
+
+# Poster cache kind and fetcher per catalog
+POSTER_LOOKUPS = {'movies': ('movie_poster', movie_poster), 'shows': ('show_image', first_image)}
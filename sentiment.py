@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.svm import LinearSVC
+import artifacts
+from text_preprocess import PIPELINE, preprocess
+
+# Emotion classifier from SentimentV2.ipynb, made servable: TF-IDF features stay
+# sparse end to end and a linear SVM (the kernel the notebook's grid search
+# picked) scores whole batches with one sparse matrix product.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASETS_DIR = os.path.join(SCRIPT_DIR, 'datasets')
+SOURCES = [os.path.join(DATASETS_DIR, 'train.csv'), os.path.join(DATASETS_DIR, 'test.csv')]
+# Bulk scoring (score_csv): rows per chunk and worker processes
+CHUNK_SIZE = int(os.environ.get('ULTRON_SENTIMENT_CHUNK', 20000))
+N_JOBS = int(os.environ.get('ULTRON_JOBS', 1))
+
+def build_model():
+    train_data = pd.read_csv(SOURCES[0])
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True, dtype=np.float32)
+    features = vectorizer.fit_transform(train_data['Text'].map(preprocess))
+    classifier = LinearSVC(C=0.5)
+    classifier.fit(features, train_data['Emotion'])
+    info = {'rows': len(train_data), 'pipeline': PIPELINE}
+    if os.path.exists(SOURCES[1]):
+        test_data = pd.read_csv(SOURCES[1])
+        predicted = classifier.predict(vectorizer.transform(test_data['Text'].map(preprocess)))
+        info['test_accuracy'] = round(float((predicted == test_data['Emotion']).mean()), 4)
+    return {
+        'vectorizer': vectorizer,
+        'classifier': classifier,
+        'info': info,
+        'version': artifacts.dataset_version(artifacts.source_stamp(SOURCES)),
+    }
+
+def save_model(model):
+    return artifacts.save('sentiment', SOURCES,
+                          models={'vectorizer': model['vectorizer'], 'classifier': model['classifier']},
+                          info=model['info'])
+
+def load_model():
+    stored = artifacts.load('sentiment', SOURCES)
+    if stored is None or stored['manifest']['info'].get('pipeline') != PIPELINE:
+        return None
+    model = dict(stored['models'])
+    model.update(info=stored['manifest']['info'], version=stored['manifest']['version'])
+    return model
+
+model = load_model()
+MODEL_SOURCE = 'artifacts' if model is not None else 'csv'
+if model is None:
+    model = build_model()
+MODEL_VERSION = model['version']
+
+vectorizer = model['vectorizer']
+classifier = model['classifier']
+
+def predict(texts):
+    # [(emotion, margin), ...] for a batch of raw review texts
+    if not texts:
+        return []
+    features = vectorizer.transform([preprocess(t) for t in texts])
+    margins = classifier.decision_function(features)
+    best = margins.argmax(axis=1)
+    labels = classifier.classes_[best]
+    return list(zip(labels.tolist(), margins[np.arange(len(best)), best].round(4).tolist()))
+
+def _score_chunk(chunk, column):
+    emotions, scores = zip(*predict(chunk[column].fillna('').tolist())) if len(chunk) else ((), ())
+    return chunk.assign(emotion=list(emotions), score=list(scores))
+
+def score_csv(path, out_path, column='Text', chunk_size=CHUNK_SIZE, jobs=N_JOBS):
+    # Stream a review CSV of any size through the classifier, CHUNK_SIZE rows at
+    # a time, writing the input columns plus emotion/score in the input order.
+    # With jobs > 1 chunks are scored in a process pool; at most 2 * jobs
+    # chunks are in flight, so memory stays bounded whatever the file size.
+    rows = 0
+    reader = pd.read_csv(path, chunksize=chunk_size)
+    with open(out_path, 'w', newline='') as out:
+        def write(scored):
+            scored.to_csv(out, header=out.tell() == 0, index=False)
+            return len(scored)
+        if jobs <= 1:
+            for chunk in reader:
+                rows += write(_score_chunk(chunk, column))
+            return rows
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            pending = deque()
+            for chunk in reader:
+                pending.append(pool.submit(_score_chunk, chunk, column))
+                if len(pending) >= 2 * jobs:
+                    rows += write(pending.popleft().result())
+            while pending:
+                rows += write(pending.popleft().result())
+    return rows
+
+if __name__ == "__main__":
+    # python sentiment.py reviews.csv scored.csv [--column Text] [-j 4]
+    parser = argparse.ArgumentParser(description='Score a review CSV with the emotion classifier')
+    parser.add_argument('path')
+    parser.add_argument('out_path')
+    parser.add_argument('--column', default='Text', help='column holding the review text')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    started = time.time()
+    rows = score_csv(args.path, args.out_path, args.column, args.chunk_size, args.jobs)
+    print(f"scored {rows} reviews in {time.time() - started:.1f}s -> {args.out_path}", file=sys.stderr)
@@ -0,0 +1,139 @@
+import os
+import gc
+import sys
+import time
+import signal
+import socket
+import argparse
+import threading
+import numpy as np
+
+# Multi-process serving on one box. A loader process imports the recommender
+# engines once and then forks the HTTP workers, which attach to its memory
+# read-only instead of loading their own copy:
+#   - neighbour tables, TF-IDF matrices and title index arrays are memory-mapped
+#     artifacts, so every worker maps the same page cache pages
+#   - everything else the loader built (catalog frames, genre bitmasks, charts,
+#     the libraries themselves) is shared copy-on-write; gc.freeze() keeps the
+#     collector from touching those pages and copying them into each worker
+# An extra worker then costs its own interpreter state, not another model.
+#   python serve.py -w 4 --port 5001
+#   kill -HUP <loader pid>    # reload the engines (e.g. after build.py) and re-fork
+# An ingest through POST /api/catalog sends that HUP itself, so every worker
+# serves the new titles, not only the one that handled the request.
+WORKERS = int(os.environ.get('ULTRON_WORKERS', os.cpu_count() or 1))
+# Engines loaded before forking; the rest still load lazily in each worker
+PRELOAD = os.environ.get('ULTRON_PRELOAD', 'movies,shows')
+
+def publish(engine):
+    # Load an engine so its model is backed by artifacts/: a model that was
+    # just built from the CSVs is saved first and re-imported memory-mapped
+    module = engine.load()
+    if module.MODEL_SOURCE != 'artifacts' and hasattr(module, 'save_model'):
+        module.save_model(module.model)
+        module = engine.reload()
+    # Workers only read these; an accidental in-place write now fails loudly
+    # instead of silently copying the pages into one worker
+    for value in vars(module).values():
+        if isinstance(value, np.ndarray) and value.flags.writeable:
+            value.flags.writeable = False
+    return module
+
+def load_engines(names):
+    import engines
+    for name in names:
+        started = time.perf_counter()
+        module = publish(engines.ENGINES[name])
+        print(f"[loader] {name}: {module.MODEL_SOURCE} {module.MODEL_VERSION} "
+              f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    # Everything allocated so far is long-lived; keep it out of the collector
+    gc.collect()
+    gc.freeze()
+
+def run_worker(app, listener, host, port, loader_pid):
+    from werkzeug.serving import make_server
+    import catalog
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    # A catalog ingest rewrote the artifacts: have the loader re-fork everyone
+    catalog.AFTER_INGEST.append(lambda kind, rows: os.kill(loader_pid, signal.SIGHUP))
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    # On SIGTERM stop accepting and let in-flight requests finish
+    server.daemon_threads = False
+    server.block_on_close = True
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    server.serve_forever()
+    server.server_close()
+
+def spawn(app, listener, host, port):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(app, listener, host, port, os.getppid())
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-forking server: load the models once, share them across workers')
+    parser.add_argument('-w', '--workers', type=int, default=WORKERS)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--preload', default=PRELOAD, help='comma-separated engines to load before forking ("all" for every engine)')
+    args = parser.parse_args()
+    if not hasattr(os, 'fork'):
+        sys.exit("serve.py needs os.fork (Linux/macOS); use python app.py instead")
+
+    # The loader loads synchronously; a warmup thread must not be running at fork time
+    os.environ['ULTRON_WARMUP'] = ''
+    import engines
+    from app import app
+    names = list(engines.ENGINES) if args.preload == 'all' else [n.strip() for n in args.preload.split(',') if n.strip() in engines.ENGINES]
+    load_engines(names)
+
+    listener = socket.create_server((args.host, args.port), backlog=128)
+    listener.set_inheritable(True)
+    state = {'reload': False, 'stop': False}
+    signal.signal(signal.SIGHUP, lambda *_: state.update(reload=True))
+    signal.signal(signal.SIGTERM, lambda *_: state.update(stop=True))
+    signal.signal(signal.SIGINT, lambda *_: state.update(stop=True))
+
+    workers = {spawn(app, listener, args.host, args.port) for _ in range(args.workers)}
+    print(f"[loader] pid {os.getpid()} serving http://{args.host}:{args.port} with {args.workers} workers", file=sys.stderr)
+    while not state['stop']:
+        if state['reload']:
+            state['reload'] = False
+            gc.unfreeze()
+            for name in names:
+                engines.ENGINES[name].reload()
+                publish(engines.ENGINES[name])
+            gc.collect()
+            gc.freeze()
+            old, workers = workers, {spawn(app, listener, args.host, args.port) for _ in range(args.workers)}
+            for pid in old:
+                os.kill(pid, signal.SIGTERM)
+            print(f"[loader] reloaded {', '.join(names)}; workers re-forked", file=sys.stderr)
+        # Reap exited workers; replace any current one that died
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid in workers:
+            workers.discard(pid)
+            print(f"[loader] worker {pid} exited ({status}), restarting", file=sys.stderr)
+            workers.add(spawn(app, listener, args.host, args.port))
+        elif not pid:
+            time.sleep(0.2)
+    for pid in workers:
+        os.kill(pid, signal.SIGTERM)
+    for pid in workers:
+        os.waitpid(pid, 0)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
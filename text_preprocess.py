@@ -0,0 +1,54 @@
+import re
+from functools import lru_cache
+
+# Review text cleanup shared by training, the API and bulk scoring. The
+# notebook version re-read the stop word list for every token; here it is a
+# frozenset, the regexes are compiled once and the lemma/stem of each distinct
+# word is cached, so bulk scoring mostly costs dictionary lookups.
+# NLTK is optional: without it (or without its corpora) scikit-learn's English
+# stop words are used and words are left unlemmatized.
+WORD_CACHE_SIZE = 1 << 18
+_NON_LETTERS = re.compile(r'[^a-zA-Z\s]')
+_NON_ALPHA = re.compile(r'[^a-zA-Z]')
+
+try:
+    from nltk.corpus import stopwords
+    STOP_WORDS = frozenset(stopwords.words('english'))
+    STOP_WORDS_SOURCE = 'nltk'
+except (ImportError, LookupError):
+    from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+    STOP_WORDS = frozenset(ENGLISH_STOP_WORDS)
+    STOP_WORDS_SOURCE = 'sklearn'
+
+try:
+    from nltk.stem import WordNetLemmatizer
+    from nltk.stem.porter import PorterStemmer
+    _lemmatizer = WordNetLemmatizer()
+    _lemmatizer.lemmatize('tests')  # loads WordNet now, raises LookupError if missing
+    _stemmer = PorterStemmer()
+    LEMMATIZER = 'wordnet'
+except (ImportError, LookupError):
+    _lemmatizer = _stemmer = None
+    LEMMATIZER = 'none'
+
+# Identifies the exact text pipeline; models trained under a different one
+# (e.g. with NLTK installed) are rebuilt instead of being fed mismatched tokens
+PIPELINE = f"{STOP_WORDS_SOURCE}-stopwords+{LEMMATIZER}"
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def lemmatize(word):
+    return _lemmatizer.lemmatize(word) if _lemmatizer is not None else word
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def stem(word):
+    return _stemmer.stem(word) if _stemmer is not None else word
+
+def preprocess(text):
+    # Letters only, lowercase, stop words dropped, lemmatized
+    words = _NON_LETTERS.sub('', str(text)).lower().split()
+    return ' '.join(lemmatize(w) for w in words if w not in STOP_WORDS)
+
+def stemming(text):
+    # Like preprocess, but non-letters become spaces and words are Porter-stemmed
+    words = _NON_ALPHA.sub(' ', str(text)).lower().split()
+    return ' '.join(stem(w) for w in words if w not in STOP_WORDS)
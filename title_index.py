@@ -0,0 +1,202 @@
+import re
+import math
+import bisect
+import unicodedata
+import numpy as np
+
+# Shared title lookup for the movie and TV catalogs:
+#   - exact map of raw and normalized titles -> row
+#   - titles sorted by normalized form, for prefix (typeahead) lookups with bisect
+#   - character trigram inverted index, for substring and ranked fuzzy matching
+NGRAM = 3
+FUZZY_MIN_SCORE = 0.45
+ARRAY_KEYS = ['postings', 'offsets', 'gram_counts', 'sorted_rows']
+RECORD_KEYS = ['normalized', 'grams']
+_NON_WORD = re.compile(r'[\W_]+')
+
+def normalize_title(title):
+    # "Spider-Man: Pokémon" -> "spider man pokemon"; non-Latin scripts are kept
+    title = ''.join(c for c in unicodedata.normalize('NFKD', str(title)) if not unicodedata.combining(c))
+    return _NON_WORD.sub(' ', title.lower()).strip()
+
+def title_grams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)}
+
+class TitleIndex:
+    def __init__(self, titles, weights=None, arrays=None):
+        # titles: row-ordered catalog titles; weights (e.g. popularity) rank
+        # prefix suggestions. arrays: output of to_arrays() from a prebuilt index.
+        self.titles = [t if isinstance(t, str) else '' for t in titles]
+        self.weights = np.zeros(len(self.titles), np.float32) if weights is None else np.asarray(weights, np.float32)
+        if arrays is None:
+            arrays = self._build()
+        self.normalized = arrays['normalized']
+        self.grams = {g: i for i, g in enumerate(arrays['grams'])}
+        self.postings = arrays['postings']
+        self.offsets = arrays['offsets']
+        self.gram_counts = arrays['gram_counts']
+        self.sorted_rows = arrays['sorted_rows']
+        self.sorted_keys = [self.normalized[r] for r in self.sorted_rows]
+        # Earlier rows win on duplicates, matching the old "first match" behaviour
+        self.exact, self.by_normalized = {}, {}
+        for row in range(len(self.titles) - 1, -1, -1):
+            self.exact[self.titles[row]] = row
+            self.by_normalized[self.normalized[row]] = row
+
+    def _build(self):
+        normalized = [normalize_title(t) for t in self.titles]
+        gram_ids, rows, gram_counts = {}, [], np.zeros(len(normalized), np.int16)
+        for row, title in enumerate(normalized):
+            grams = title_grams(title) if title else set()
+            gram_counts[row] = len(grams)
+            rows.extend((gram_ids.setdefault(g, len(gram_ids)), row) for g in grams)
+        pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+        pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+        offsets = np.zeros(len(gram_ids) + 1, np.int64)
+        np.cumsum(np.bincount(pairs[:, 0], minlength=len(gram_ids)), out=offsets[1:])
+        return {
+            'normalized': normalized,
+            'grams': list(gram_ids),
+            'postings': pairs[:, 1].astype(np.int32),
+            'offsets': offsets,
+            'gram_counts': gram_counts,
+            'sorted_rows': np.array(sorted(range(len(normalized)), key=normalized.__getitem__), np.int32),
+        }
+
+    def to_arrays(self):
+        return {
+            'normalized': self.normalized,
+            'grams': list(self.grams),
+            'postings': self.postings,
+            'offsets': self.offsets,
+            'gram_counts': self.gram_counts,
+            'sorted_rows': self.sorted_rows,
+        }
+
+    def artifact_parts(self):
+        # (arrays, records) for artifacts.save: numeric parts as .npy, strings as JSON
+        parts = self.to_arrays()
+        arrays = {f"title_{k}": parts[k] for k in ARRAY_KEYS}
+        records = {f"title_{k}": parts[k] for k in RECORD_KEYS}
+        return arrays, records
+
+    @classmethod
+    def from_artifacts(cls, titles, weights, arrays, records):
+        parts = {k: arrays[f"title_{k}"] for k in ARRAY_KEYS}
+        parts.update({k: records[f"title_{k}"] for k in RECORD_KEYS})
+        return cls(titles, weights, parts)
+
+    def _posting(self, gram_id):
+        return self.postings[self.offsets[gram_id]:self.offsets[gram_id + 1]]
+
+    def _gram_matches(self, query_grams, min_shared=1):
+        # Rows sharing at least min_shared query grams, with the shared count.
+        # Any such row must appear in one of the len - (min_shared - 1) rarest
+        # posting lists, so only those generate candidates; the long lists of
+        # common grams are just probed with a binary search.
+        ids = sorted((i for i in (self.grams.get(g) for g in query_grams) if i is not None),
+                     key=lambda i: self.offsets[i + 1] - self.offsets[i])
+        n_probe = len(ids) - (min_shared - 1)
+        if n_probe <= 0:
+            return np.empty(0, np.int64), np.empty(0, np.int64)
+        probe = [self._posting(i) for i in ids[:n_probe]]
+        if sum(len(p) for p in probe) > len(self.titles) // 8:
+            # Only common grams to go on: a dense count over the catalog is cheaper
+            counts = np.bincount(np.concatenate([self._posting(i) for i in ids]), minlength=len(self.titles))
+            rows = np.flatnonzero(counts >= min_shared)
+            return rows, counts[rows]
+        rows = np.unique(np.concatenate(probe))
+        counts = np.zeros(len(rows), np.int64)
+        for i in ids:
+            posting = self._posting(i)
+            pos = np.minimum(np.searchsorted(posting, rows), len(posting) - 1)
+            counts += posting[pos] == rows
+        keep = counts >= min_shared
+        return rows[keep], counts[keep]
+
+    def prefix(self, query, limit=10):
+        # Rows whose normalized title starts with query, most popular first
+        key = normalize_title(query)
+        if not key:
+            return []
+        lo = bisect.bisect_left(self.sorted_keys, key)
+        hi = bisect.bisect_left(self.sorted_keys, key + '\uffff')
+        rows = np.asarray(self.sorted_rows[lo:hi])
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-self.weights[rows], limit - 1)[:limit]]
+        return rows[np.lexsort((rows, -self.weights[rows]))].tolist()
+
+    def _containing(self, key):
+        # Candidate rows (ascending) that may contain key; callers verify with `in`
+        if len(key) < NGRAM:
+            # Every title containing a short key has a gram containing it
+            lists = [self._posting(i) for g, i in self.grams.items() if key in g]
+            return np.unique(np.concatenate(lists)) if lists else np.empty(0, np.int64)
+        # Only grams inside the query: its padded edges need not be word edges
+        inner = {key[i:i + NGRAM] for i in range(len(key) - NGRAM + 1)}
+        rows, _ = self._gram_matches(inner, min_shared=len(inner))
+        return rows
+
+    def contains(self, query):
+        # First row (catalog order) whose normalized title contains query
+        key = normalize_title(query)
+        if not key:
+            return None
+        for row in self._containing(key):
+            if key in self.normalized[row]:
+                return int(row)
+        return None
+
+    def word_prefix(self, query, limit=10):
+        # Rows with a word starting with query ("conj" -> "The Conjuring"), most popular first
+        key = normalize_title(query)
+        if not key:
+            return []
+        needle = ' ' + key
+        rows = np.array([r for r in self._containing(key) if needle in ' ' + self.normalized[r]], np.int64)
+        if len(rows) > limit:
+            rows = rows[np.argpartition(-self.weights[rows], limit - 1)[:limit]]
+        return rows[np.lexsort((rows, -self.weights[rows]))].tolist()
+
+    def fuzzy(self, query, limit=10, min_score=FUZZY_MIN_SCORE):
+        # Rows ranked by trigram Dice similarity to query
+        key = normalize_title(query)
+        if not key:
+            return []
+        query_grams = title_grams(key)
+        # Dice >= min_score needs at least this many shared grams (titles have >= 1)
+        min_shared = max(1, math.ceil(min_score * (len(query_grams) + 1) / 2))
+        rows, counts = self._gram_matches(query_grams, min_shared)
+        if not len(rows):
+            return []
+        scores = 2.0 * counts / (len(query_grams) + self.gram_counts[rows])
+        keep = scores >= min_score
+        rows, scores = rows[keep], scores[keep]
+        if len(rows) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            rows, scores = rows[top], scores[top]
+        order = np.lexsort((-self.weights[rows], -scores))
+        return rows[order].tolist()
+
+    def resolve(self, title):
+        # Exact title, then normalized title, then substring, then best fuzzy match
+        row = self.exact.get(title)
+        if row is None:
+            row = self.by_normalized.get(normalize_title(title))
+        if row is None:
+            row = self.contains(title)
+        if row is None:
+            matches = self.fuzzy(title, limit=1)
+            row = matches[0] if matches else None
+        return row
+
+    def suggest(self, query, limit=10):
+        # Typeahead: title prefix, then word prefix, then fuzzy matches
+        rows = self.prefix(query, limit)
+        for more in (self.word_prefix, self.fuzzy):
+            if len(rows) >= limit:
+                break
+            seen = set(rows)
+            rows += [r for r in more(query, limit + len(rows)) if r not in seen][:limit - len(rows)]
+        return [{'id': int(r), 'title': self.titles[r]} for r in rows]